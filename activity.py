@@ -0,0 +1,100 @@
+"""
+=========================================================================================
+
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module learns the activity of the feeds of an account (new articles per hour, for each hour of the day) from the unread deltas of the polls, and derives the polling interval of the daemon from it: short when the feeds are busy, long when they are quiet.
+
+=========================================================================================
+"""
+
+import time
+
+# Weight of a new observation in the average rate of an hour of the day
+SMOOTHING = 0.3
+
+'''
+===================================================
+	Define a function to create an empty activity
+	history: the average number of new articles
+	per hour for each hour of the day (None until
+	observed), the time of the last poll and its
+	unread snapshot (the baseline of the new
+	articles of the next poll, even if the
+	notification of the last poll failed)
+===================================================
+'''
+
+def new_history():
+	return {'rates': [None] * 24, 'last_poll': 0, 'unread': None}
+
+'''
+===================================================
+	Define a function to record the new articles
+	found by a poll
+
+	*	The rate is the number of new articles
+		divided by the time since the last poll
+		(in hours)
+
+	*	It is added to the exponential moving
+		average of the current hour of the day
+
+	Nothing is recorded for the first poll (all
+	the unread articles would look new)
+===================================================
+'''
+
+def record(history, new_articles, now=None):
+	now = now or time.time()
+	last_poll = history['last_poll']
+	history['last_poll'] = now
+
+	if not last_poll or now <= last_poll:
+		return
+
+	rate = new_articles * 3600 / (now - last_poll)
+	hour = time.localtime(now).tm_hour
+	average = history['rates'][hour]
+
+	history['rates'][hour] = rate if average is None else average + SMOOTHING * (rate - average)
+
+'''
+===================================================
+	Define a function to compute the delay (in
+	seconds) before the next poll
+
+	*	Take the highest rate of the current and
+		the next hour of the day, so that the
+		polls speed up before a busy hour starts
+
+	*	Poll about once per new article at that
+		rate, within the minimum and maximum
+		intervals
+
+	*	Until the current hour is learnt, use the
+		default interval
+===================================================
+'''
+
+def next_interval(history, interval, min_interval, max_interval, now=None):
+	hour = time.localtime(now or time.time()).tm_hour
+	rates = [rate for rate in (history['rates'][hour], history['rates'][(hour + 1) % 24]) if rate is not None]
+
+	if history['rates'][hour] is None:
+		return min(max(interval, min_interval), max_interval)
+
+	rate = max(rates)
+	delay = 3600 / rate if rate > 0 else max_interval
+
+	return min(max(delay, min_interval), max_interval)
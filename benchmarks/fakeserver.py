@@ -0,0 +1,401 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides a local stand-in for the Inoreader API, used to measure the performance of Inopy without a real account.
+
+	It serves the unread counts, the subscriptions list (with ETag revalidation), the stream item ids (paginated) and item contents of the unread articles and the OAuth token endpoint (with rotated refresh tokens) of a synthetic account of N feeds in M folders with a skewed unread distribution. A bearer token is required: requests without one get a 403 response and requests with an outdated one get a 401 response. A latency can be added to every response and the requests are counted.
+
+	Usage: python benchmarks/fakeserver.py [--feeds N] [--folders M] [--latency SECONDS] [--port PORT]
+
+=========================================================================================
+"""
+
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Paths of the API endpoints
+UNREAD_COUNTS_PATH = '/reader/api/0/unread-count'
+FEEDS_LIST_PATH = '/reader/api/0/subscription/list'
+TOKEN_PATH = '/oauth2/token'
+STREAM_IDS_PATH = '/reader/api/0/stream/items/ids'
+STREAM_CONTENTS_PATH = '/reader/api/0/stream/items/contents'
+
+# Maximum number of item ids per page
+PAGE_SIZE = 20
+
+'''
+=====================================================
+	Define a class generating a synthetic account
+
+	*	feeds subscriptions spread over folders
+		folders (labels)
+
+	*	A ratio of the feeds has unread articles,
+		with counts following a Pareto distribution
+		(a few feeds have most of the articles)
+
+	*	The unread counts of the folders and of the
+		reading-list are the sums of their feeds
+
+	*	The unread articles of the feed with index i
+		have the ids i * 100000 + k (newest first)
+
+	The response bodies are generated once. Calling
+	add_articles adds new unread articles to some
+	feeds (e.g. between two polls)
+=====================================================
+'''
+
+class FakeAccount:
+
+	def __init__(self, feeds=100, folders=10, unread_ratio=0.2, seed=0):
+		self.random = random.Random(seed)
+		self.user = 'user/1005921515'
+		self.subscriptions = []
+		self.unread = {}
+		self.newest = {}
+		self.index = {}
+
+		for i in range(feeds):
+			folder = i % max(folders, 1)
+			feed_id = 'feed/https://example.com/{}/rss'.format(i)
+			self.index[feed_id] = i
+
+			self.subscriptions.append({
+				'id': feed_id,
+				'title': 'Feed {}'.format(i),
+				'categories': [{'id': '{}/label/Folder {}'.format(self.user, folder), 'label': 'Folder {}'.format(folder)}] if folders else [],
+				'sortid': '{:08X}'.format(i),
+				'firstitemmsec': 1424501776942006,
+				'url': 'https://example.com/{}/rss'.format(i),
+				'htmlUrl': 'https://example.com/{}/'.format(i),
+				'iconUrl': 'https://www.inoreader.com/fetch_icon/example.com?w=16&h=16'
+			})
+
+			if self.random.random() < unread_ratio:
+				self.unread[feed_id] = min(1000, int(self.random.paretovariate(1.2)))
+				self.newest[feed_id] = 1424501776942006 + i
+
+		self.feeds_list_body = json.dumps({'subscriptions': self.subscriptions}).encode()
+		self.feeds_list_etag = '"{}"'.format(hashlib.md5(self.feeds_list_body).hexdigest())
+		self.build_unread_counts()
+
+	def build_unread_counts(self):
+		folders = {}
+		newest = {}
+
+		for subscribed in self.subscriptions:
+			feed_id = subscribed['id']
+
+			if feed_id in self.unread:
+				for category in subscribed['categories']:
+					folders[category['id']] = folders.get(category['id'], 0) + self.unread[feed_id]
+					newest[category['id']] = max(newest.get(category['id'], 0), self.newest[feed_id])
+
+		counts = dict(self.unread)
+		counts.update(folders)
+		counts[self.user + '/state/com.google/reading-list'] = sum(self.unread.values())
+
+		newest.update(self.newest)
+		newest[self.user + '/state/com.google/reading-list'] = max(self.newest.values(), default=0)
+
+		unreadcounts = [
+			{'id': unread_id, 'count': count, 'newestItemTimestampUsec': str(newest[unread_id])}
+			for unread_id, count in counts.items()
+		]
+
+		self.unread_counts_body = json.dumps({'max': 1000, 'unreadcounts': unreadcounts}).encode()
+
+	def add_articles(self, feeds=10):
+		now = int(time.time() * 1e6)
+
+		for subscribed in self.random.sample(self.subscriptions, min(feeds, len(self.subscriptions))):
+			self.unread[subscribed['id']] = self.unread.get(subscribed['id'], 0) + 1
+			self.newest[subscribed['id']] = now
+
+		self.build_unread_counts()
+
+	def item_ids(self, feed_id):
+		i = self.index.get(feed_id)
+
+		if i is None:
+			return []
+
+		return [str(i * 100000 + k) for k in range(self.unread.get(feed_id, 0), 0, -1)]
+
+	def stream_ids_body(self, feed_id, count, continuation):
+		start = int(continuation or 0)
+		count = min(count, PAGE_SIZE)
+		ids = self.item_ids(feed_id)
+		body = {'items': [], 'itemRefs': [{'id': item_id, 'directStreamIds': []} for item_id in ids[start:start + count]]}
+
+		if start + count < len(ids):
+			body['continuation'] = str(start + count)
+
+		return json.dumps(body).encode()
+
+	def stream_contents_body(self, item_ids):
+		items = [
+			{'id': 'tag:google.com,2005:reader/item/{:016x}'.format(int(item_id)), 'title': 'Feed {} article {}'.format(*divmod(int(item_id), 100000))}
+			for item_id in item_ids
+		]
+
+		return json.dumps({'items': items}).encode()
+
+'''
+=====================================================
+	Define the request handler of the fake API
+=====================================================
+'''
+
+class Handler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, format, *args):
+		pass
+
+	def send(self, status, body=b'', headers=None):
+		self.send_response(status)
+		self.send_header('Content-Length', str(len(body)))
+
+		for name, value in (headers or {}).items():
+			self.send_header(name, value)
+
+		self.end_headers()
+		self.wfile.write(body)
+
+	def authorized(self):
+		bearer = self.headers.get('Authorization', '')[len('Bearer '):]
+
+		if not bearer:
+			self.send(403)
+			return False
+
+		if bearer != self.server.access_token:
+			self.send(401)
+			return False
+
+		return True
+
+	def do_GET(self):
+		server = self.server
+		server.count_request(self.path)
+		time.sleep(server.latency)
+
+		path = urlparse(self.path).path
+		query = parse_qs(urlparse(self.path).query)
+
+		if path not in (UNREAD_COUNTS_PATH, FEEDS_LIST_PATH, STREAM_IDS_PATH, STREAM_CONTENTS_PATH):
+			self.send(404)
+			return
+
+		if not self.authorized():
+			return
+
+		headers = server.ratelimit_headers()
+
+		if path == UNREAD_COUNTS_PATH:
+			self.send(200, server.account.unread_counts_body, headers)
+
+		elif path == STREAM_IDS_PATH:
+			self.send(200, server.account.stream_ids_body(query['s'][0], int(query['n'][0]), query.get('c', [None])[0]), headers)
+
+		elif path == STREAM_CONTENTS_PATH:
+			self.send(200, server.account.stream_contents_body(query.get('i', [])), headers)
+
+		elif self.headers.get('If-None-Match') == server.account.feeds_list_etag:
+			self.send(304, b'', headers)
+
+		else:
+			headers['ETag'] = server.account.feeds_list_etag
+			self.send(200, server.account.feeds_list_body, headers)
+
+	def do_POST(self):
+		server = self.server
+		server.count_request(self.path)
+		time.sleep(server.latency)
+
+		length = int(self.headers.get('Content-Length', 0))
+		payload = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode()).items()}
+
+		if urlparse(self.path).path != TOKEN_PATH:
+			self.send(404)
+			return
+
+		grant_type = payload.get('grant_type')
+
+		if grant_type == 'refresh_token' and payload.get('refresh_token') != server.refresh_token:
+			self.send(400, json.dumps({'error': 'invalid_grant'}).encode())
+			return
+
+		if grant_type not in ('refresh_token', 'authorization_code'):
+			self.send(400, json.dumps({'error': 'unsupported_grant_type'}).encode())
+			return
+
+		server.rotate_tokens()
+
+		body = {
+			'access_token': server.access_token,
+			'refresh_token': server.refresh_token,
+			'expires_in': 3600,
+			'token_type': 'Bearer',
+			'scope': 'read'
+		}
+
+		self.send(200, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+
+'''
+=====================================================
+	Define the fake API server
+
+	*	rotate_tokens issues a new access token and
+		a new refresh token (the previous ones are
+		no longer valid)
+
+	*	expire_token makes the current access token
+		invalid (the next API requests get a 401)
+
+	*	count_request and requests count the
+		requests per path
+
+	*	start runs the server in a daemon thread
+=====================================================
+'''
+
+class FakeInoreader(ThreadingHTTPServer):
+	daemon_threads = True
+
+	def __init__(self, account, latency=0, host='127.0.0.1', port=0):
+		super().__init__((host, port), Handler)
+		self.account = account
+		self.latency = latency
+		self.generation = 0
+		self.access_token = 'access-0'
+		self.refresh_token = 'refresh-0'
+		self.usage = 0
+		self.lock = threading.Lock()
+		self.counts = {}
+
+	@property
+	def url(self):
+		return 'http://{}:{}'.format(*self.server_address)
+
+	def rotate_tokens(self):
+		with self.lock:
+			self.generation += 1
+			self.access_token = 'access-{}'.format(self.generation)
+			self.refresh_token = 'refresh-{}'.format(self.generation)
+
+	def expire_token(self):
+		with self.lock:
+			self.access_token = 'expired-{}'.format(self.generation)
+
+	def count_request(self, path):
+		with self.lock:
+			path = urlparse(path).path
+			self.counts[path] = self.counts.get(path, 0) + 1
+
+			if path != TOKEN_PATH:
+				self.usage += 1
+
+	def requests(self):
+		with self.lock:
+			return sum(self.counts.values())
+
+	def reset_counts(self):
+		with self.lock:
+			self.counts = {}
+
+	def ratelimit_headers(self):
+		return {
+			'X-Reader-Zone1-Usage': str(self.usage),
+			'X-Reader-Zone1-Limit': '100000',
+			'X-Reader-Zone2-Usage': '0',
+			'X-Reader-Zone2-Limit': '100',
+			'X-Reader-Limits-Reset-After': '86400'
+		}
+
+	def start(self):
+		threading.Thread(target=self.serve_forever, daemon=True).start()
+		return self
+
+'''
+=====================================================
+	Define a function to get the config file data of
+	Inopy pointing to a fake server
+=====================================================
+'''
+
+def inopy_config(url, bearer, refresh_token):
+	return {
+		'oauth': {
+			'bearer': bearer,
+			'refresh_token': refresh_token,
+			'endpoint': url + TOKEN_PATH,
+			'client_id': 'client',
+			'client_secret': 'secret',
+			'callback': url + '/oauth-callback',
+			'scope': 'read',
+			'csrf': '4902358490258',
+			'home_url': 'http://localhost:5000'
+		},
+		'inoapi': {
+			'unread_counts_url': url + UNREAD_COUNTS_PATH,
+			'feeds_list_url': url + FEEDS_LIST_PATH
+		},
+		'notification': {
+			'summary': 'Inoreader',
+			'singular_article': 'new article in',
+			'plural_articles': 'new articles in'
+		},
+		'prod': {
+			'status': 'true',
+			'browser_path': '/usr/bin/firefox',
+			'host': '0.0.0.0',
+			'port': '5000'
+		}
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description='Run a fake Inoreader API server.')
+	parser.add_argument('--feeds', type=int, default=100, help='number of feeds (default: 100)')
+	parser.add_argument('--folders', type=int, default=10, help='number of folders (default: 10)')
+	parser.add_argument('--unread', type=float, default=0.2, help='ratio of unread feeds (default: 0.2)')
+	parser.add_argument('--latency', type=float, default=0, help='latency of every response in seconds (default: 0)')
+	parser.add_argument('--port', type=int, default=8080, help='port (default: 8080)')
+	args = parser.parse_args()
+
+	account = FakeAccount(args.feeds, args.folders, args.unread)
+	server = FakeInoreader(account, args.latency, port=args.port)
+
+	print('Fake Inoreader API listening on {}. Inopy config:'.format(server.url))
+	print(json.dumps(inopy_config(server.url, server.access_token, server.refresh_token), indent=4))
+	sys.stdout.flush()
+
+	try:
+		server.serve_forever()
+
+	except KeyboardInterrupt:
+		server.server_close()
+
+if __name__ == '__main__':
+	main()
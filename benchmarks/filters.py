@@ -0,0 +1,169 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This script benchmarks the filter rules on synthetic accounts of 10k and 50k unread feeds (or the sizes given on the command line) with 10, 100 and 500 rules (or the numbers given with --rules).
+
+	For each size and number of rules it measures the time to compile the rules and to select the feeds to notify, and compares it with a naive evaluation checking every rule against every feed. The time per feed of the compiled rules should stay roughly constant as the number of rules grows.
+
+	Usage: python benchmarks/filters.py [SIZE ...] [--rules N ...] [--runs N]
+
+=========================================================================================
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+# Import the Inopy modules from the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feeds import FeedRegistry
+from filters import RuleSet, label
+
+'''
+================================================
+	Define a function to generate a synthetic
+	registry (one folder per 50 feeds, all of
+	them unread) and a mix of rules: 40% id
+	prefixes, 30% folders and 30% title regular
+	expressions, each rule matching a few feeds
+================================================
+'''
+
+def generate(size, rules):
+	registry = FeedRegistry()
+	unreadcounts = {}
+
+	for i in range(size):
+		feed_id = 'feed/https://example{}.com/{}/rss'.format(i % 1000, i)
+		registry.add_feed(feed_id, 'Feed {} news'.format(i), ['user/1005921515/label/Folder {}'.format(i // 50)])
+		unreadcounts[feed_id] = i % 7 + 1
+
+	rule_list = []
+
+	for r in range(rules):
+		kind = r % 10
+
+		if kind < 4:
+			rule_list.append({'id_prefix': 'feed/https://example{}.com/'.format(r * 7 % 1000), 'min_count': 3})
+
+		elif kind < 7:
+			rule_list.append({'folder': 'Folder {}'.format(r * 3 % max(size // 50, 1)), 'action': 'exclude'})
+
+		else:
+			rule_list.append({'title': r'^Feed {}\d news$'.format(r), 'priority': r % 5})
+
+	return registry, unreadcounts, rule_list
+
+'''
+================================================
+	Define a naive evaluation checking every
+	rule against every feed (with the same
+	semantics as the compiled rules)
+================================================
+'''
+
+def naive_select(rule_list, registry, unreadcounts):
+	patterns = [re.compile(rule['title']) if 'title' in rule else None for rule in rule_list]
+	includes = any(rule.get('action') == 'include' for rule in rule_list)
+	selected = {}
+
+	for unread_id, count in unreadcounts.items():
+		title = registry.title(unread_id)
+		labels = [label(folder_id) for folder_id in registry.folders_of(unread_id)]
+		included = not includes
+		excluded = False
+		priority = None
+		min_count = 1
+
+		for rule, pattern in zip(rule_list, patterns):
+			if 'id_prefix' in rule:
+				matched = unread_id.startswith(rule['id_prefix'])
+
+			elif 'folder' in rule:
+				matched = label(rule['folder']) in labels
+
+			else:
+				matched = pattern.search(title) is not None
+
+			if not matched:
+				continue
+
+			if rule.get('action') == 'exclude':
+				excluded = True
+				break
+
+			included = included or rule.get('action') == 'include'
+
+			if rule.get('priority') is not None:
+				priority = rule['priority'] if priority is None else max(priority, rule['priority'])
+
+			min_count = max(min_count, rule.get('min_count', 1))
+
+		if not excluded and included and count >= min_count:
+			selected[unread_id] = (count, priority or 0)
+
+	return selected
+
+'''
+================================================
+	Define a function to measure the best time
+	(in seconds) to compile the rules, to select
+	the feeds with the compiled rules and with
+	the naive evaluation
+================================================
+'''
+
+def measure(registry, unreadcounts, rule_list, runs):
+	best_compile = best_select = best_naive = float('inf')
+
+	for _ in range(runs):
+		start = time.perf_counter()
+		rules = RuleSet(rule_list)
+		compiled = time.perf_counter()
+		selected = rules.select(registry, unreadcounts)
+		done = time.perf_counter()
+		naive = naive_select(rule_list, registry, unreadcounts)
+		naive_done = time.perf_counter()
+
+		assert selected == naive
+
+		best_compile = min(best_compile, compiled - start)
+		best_select = min(best_select, done - compiled)
+		best_naive = min(best_naive, naive_done - done)
+
+	return best_compile, best_select, best_naive
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the filter rules.')
+	parser.add_argument('sizes', type=int, nargs='*', default=[10000, 50000], help='numbers of unread feeds (default: 10000 50000)')
+	parser.add_argument('--rules', type=int, nargs='+', default=[10, 100, 500], help='numbers of rules (default: 10 100 500)')
+	parser.add_argument('--runs', type=int, default=3, help='number of measures (default: 3)')
+	args = parser.parse_args()
+
+	print(f'{"feeds":>8} {"rules":>6} {"compile [ms]":>13} {"select [ms]":>12} {"naive [ms]":>11} {"ns/feed":>9}')
+
+	for size in args.sizes:
+		for rules in args.rules:
+			registry, unreadcounts, rule_list = generate(size, rules)
+			compile_time, select, naive = measure(registry, unreadcounts, rule_list, args.runs)
+			per_feed = select / size * 1e9
+
+			print(f'{size:>8} {rules:>6} {compile_time * 1e3:>13.2f} {select * 1e3:>12.2f} {naive * 1e3:>11.2f} {per_feed:>9.0f}')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,121 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This script measures the import time of Inopy with the -X importtime option of the Python interpreter and checks it against the budget stored in importtime_budget.json.
+
+	It reports the slowest imported modules and fails (exit status 1) if the cumulative import time exceeds the budget or if a module that should be lazily loaded (e.g. Flask, waitress or pydbus) is imported on the common path.
+
+	Usage: python benchmarks/importtime.py [--runs N] [--top N]
+
+=========================================================================================
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Set the repository and budget file paths
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.dirname(bench_dir)
+budget_path = os.path.join(bench_dir, 'importtime_budget.json')
+
+'''
+================================================
+	Define a function to import a module in a
+	fresh interpreter with -X importtime and
+	parse the report written on stderr.
+
+	Each report line has the following format:
+
+	import time: self [us] | cumulative | name
+
+	Return a dictionary mapping each imported
+	module name to its (self, cumulative) times
+	in microseconds
+================================================
+'''
+
+def measure(module):
+	command = [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)]
+	result = subprocess.run(command, cwd=repo_dir, capture_output=True, text=True)
+
+	if result.returncode != 0:
+		raise RuntimeError(result.stderr.strip().split('\n')[-1])
+
+	times = {}
+
+	for line in result.stderr.split('\n'):
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+
+		self_us, cumulative_us, name = line[len('import time:'):].split('|')
+		times[name.strip()] = (int(self_us), int(cumulative_us))
+
+	return times
+
+'''
+================================================
+	Run the measure several times and keep the
+	best cumulative time of each module to
+	reduce the noise.
+
+	Print the slowest modules and check the
+	results against the budget
+================================================
+'''
+
+def main():
+	parser = argparse.ArgumentParser(description='Check the import time of Inopy against a budget.')
+	parser.add_argument('--runs', type=int, default=5, help='number of measures (default: 5)')
+	parser.add_argument('--top', type=int, default=15, help='number of slowest modules to report (default: 15)')
+	args = parser.parse_args()
+
+	with open(budget_path) as budget_file:
+		budget = json.load(budget_file)
+
+	module = budget['module']
+	best = {}
+
+	for _ in range(args.runs):
+		for name, (self_us, cumulative_us) in measure(module).items():
+			if name not in best or cumulative_us < best[name][1]:
+				best[name] = (self_us, cumulative_us)
+
+	print(f'{"self [us]":>10} {"cumulative":>10}  module')
+
+	for name, (self_us, cumulative_us) in sorted(best.items(), key=lambda item: item[1][1], reverse=True)[:args.top]:
+		print(f'{self_us:>10} {cumulative_us:>10}  {name}')
+
+	failures = []
+	total = best[module][1]
+
+	if total > budget['max_cumulative_us']:
+		failures.append(f'import {module} took {total} us (budget: {budget["max_cumulative_us"]} us)')
+
+	for name in budget['forbidden']:
+		if name in best:
+			failures.append(f'{name} is imported on the common path')
+
+	print(f'\nimport {module}: {total} us (budget: {budget["max_cumulative_us"]} us)')
+
+	for failure in failures:
+		print(f'FAILED: {failure}')
+
+	sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,128 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This script benchmarks the parsing of a synthetic feeds list response of 50k subscriptions (or the sizes given on the command line).
+
+	For each size it compares the former parsing (decoding the body to a string and building the whole object tree) with the parsing module (from bytes, streamed with ijson if it is installed), and reports the time and the peak memory allocated while building the feed registry.
+
+	Usage: python benchmarks/parsing.py [SIZE ...] [--runs N]
+
+=========================================================================================
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+# Import the Inopy modules from the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsing
+from feeds import FeedRegistry
+
+'''
+================================================
+	Define a function to generate the body of
+	a synthetic feeds list response, with the
+	fields returned by the API
+================================================
+'''
+
+def generate(size):
+	subscriptions = []
+
+	for i in range(size):
+		subscriptions.append({
+			'id': 'feed/https://example.com/{}/rss'.format(i),
+			'title': 'Feed {}'.format(i),
+			'categories': [{'id': 'user/1005921515/label/Folder {}'.format(i // 50), 'label': 'Folder {}'.format(i // 50)}],
+			'sortid': '{:08X}'.format(i),
+			'firstitemmsec': 1424501776942006,
+			'url': 'https://example.com/{}/rss'.format(i),
+			'htmlUrl': 'https://example.com/{}/'.format(i),
+			'iconUrl': 'https://www.inoreader.com/fetch_icon/example.com?w=16&h=16'
+		})
+
+	return json.dumps({'subscriptions': subscriptions}).encode()
+
+'''
+================================================
+	Define the parsers to compare. Each of them
+	builds a feed registry from the body
+================================================
+'''
+
+def parse_text(body):
+	registry = FeedRegistry()
+
+	for subscribed in json.loads(body.decode())['subscriptions']:
+		registry.add_subscription(subscribed)
+
+	return registry
+
+def parse_stream(body):
+	registry = FeedRegistry()
+
+	for feed_id, title, folder_ids in parsing.iter_subscriptions(io.BytesIO(body)):
+		registry.add_feed(feed_id, title, folder_ids)
+
+	return registry
+
+'''
+================================================
+	Define a function to measure the best time
+	(in seconds) and the peak memory allocated
+	(in bytes) by a parser
+================================================
+'''
+
+def measure(parser, body, runs):
+	best = float('inf')
+
+	for _ in range(runs):
+		start = time.perf_counter()
+		parser(body)
+		best = min(best, time.perf_counter() - start)
+
+	tracemalloc.start()
+	parser(body)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return best, peak
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the parsing of the feeds list.')
+	parser.add_argument('sizes', type=int, nargs='*', default=[50000], help='numbers of subscriptions (default: 50000)')
+	parser.add_argument('--runs', type=int, default=3, help='number of measures (default: 3)')
+	args = parser.parse_args()
+
+	backend = 'ijson ({})'.format(parsing.ijson.backend) if parsing.streaming else 'orjson' if parsing.orjson else 'json'
+	print(f'parsing module backend: {backend}\n')
+	print(f'{"feeds":>8} {"body [MB]":>10} {"parser":>8} {"time [ms]":>10} {"peak [MB]":>10}')
+
+	for size in args.sizes:
+		body = generate(size)
+
+		for name, function in (('text', parse_text), ('stream', parse_stream)):
+			best, peak = measure(function, body, args.runs)
+			print(f'{size:>8} {len(body) / 1e6:>10.1f} {name:>8} {best * 1e3:>10.1f} {peak / 1e6:>10.1f}')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,114 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This script benchmarks the feed registry on synthetic accounts of 10k and 50k subscriptions (or the sizes given on the command line).
+
+	For each size it measures the time to build the registry from the feeds list, to look up the title of every unread feed and to aggregate the unread counts per feed and per folder, and reports the time per subscription, which should stay roughly constant as the number of subscriptions grows.
+
+	Usage: python benchmarks/registry.py [SIZE ...] [--unread RATIO] [--runs N]
+
+=========================================================================================
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Import the Inopy modules from the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feeds import FeedRegistry
+
+'''
+================================================
+	Define a function to generate a synthetic
+	feeds list (with one folder per 50 feeds)
+	and the unread counts of a ratio of them
+================================================
+'''
+
+def generate(size, unread_ratio):
+	subscriptions = []
+
+	for i in range(size):
+		folder_id = 'user/1005921515/label/Folder {}'.format(i // 50)
+
+		subscriptions.append({
+			'id': 'feed/https://example.com/{}/rss'.format(i),
+			'title': 'Feed {}'.format(i),
+			'categories': [{'id': folder_id, 'label': 'Folder {}'.format(i // 50)}]
+		})
+
+	step = max(1, int(1 / unread_ratio))
+	unreadcounts = {subscriptions[i]['id']: i % 7 + 1 for i in range(0, size, step)}
+
+	return subscriptions, unreadcounts
+
+'''
+================================================
+	Define a function to measure the best time
+	(in seconds) to build the registry, to look
+	up the unread feeds and to aggregate their
+	counts
+================================================
+'''
+
+def measure(subscriptions, unreadcounts, runs):
+	best_build = best_lookup = best_aggregate = float('inf')
+
+	for _ in range(runs):
+		start = time.perf_counter()
+		registry = FeedRegistry()
+
+		for subscribed in subscriptions:
+			registry.add_subscription(subscribed)
+
+		built = time.perf_counter()
+
+		for unread_id in unreadcounts:
+			if not registry.is_folder(unread_id):
+				registry.title(unread_id)
+
+		looked_up = time.perf_counter()
+
+		registry.aggregate(unreadcounts)
+
+		done = time.perf_counter()
+
+		best_build = min(best_build, built - start)
+		best_lookup = min(best_lookup, looked_up - built)
+		best_aggregate = min(best_aggregate, done - looked_up)
+
+	return best_build, best_lookup, best_aggregate
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the feed registry.')
+	parser.add_argument('sizes', type=int, nargs='*', default=[10000, 50000], help='numbers of subscriptions (default: 10000 50000)')
+	parser.add_argument('--unread', type=float, default=0.1, help='ratio of unread feeds (default: 0.1)')
+	parser.add_argument('--runs', type=int, default=5, help='number of measures (default: 5)')
+	args = parser.parse_args()
+
+	print(f'{"feeds":>8} {"unread":>8} {"build [ms]":>11} {"lookup [ms]":>12} {"aggregate [ms]":>15} {"ns/feed":>9}')
+
+	for size in args.sizes:
+		subscriptions, unreadcounts = generate(size, args.unread)
+		build, lookup, aggregate = measure(subscriptions, unreadcounts, args.runs)
+		per_feed = (build + lookup + aggregate) / size * 1e9
+
+		print(f'{size:>8} {len(unreadcounts):>8} {build * 1e3:>11.2f} {lookup * 1e3:>12.2f} {aggregate * 1e3:>15.2f} {per_feed:>9.0f}')
+
+if __name__ == '__main__':
+	main()
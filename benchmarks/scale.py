@@ -0,0 +1,209 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This script runs the real polling flow of Inopy against the fake Inoreader API server (see fakeserver.py) on synthetic accounts of 100, 10k and 100k feeds (or the sizes given on the command line).
+
+	For each size, three runs are measured in a fresh process: a cold run (no cache), a warm run (cached feeds list revalidated, a few new articles) and a run with an expired token (401 response and token refresh). Each run reports its wall time, the time spent in each phase, the peak RSS of the process and the number of requests received by the server. The notifications are recorded instead of being sent over D-Bus.
+
+	Usage: python benchmarks/scale.py [SIZE ...] [--folders-ratio R] [--latency SECONDS] [--json FILE]
+
+=========================================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.dirname(bench_dir)
+
+# Phases measured in the child process: (name, module, function)
+PHASES = [
+	('load state', 'ino', 'load_state'),
+	('refresh ahead', 'ino', 'refresh_ahead'),
+	('http requests', 'ino', 'authorized_requests'),
+	('token recovery', 'ino', 'recover_token'),
+	('feeds list parsing', 'ino', 'parse_subscriptions'),
+	('unread parsing', 'ino', 'getData'),
+	('unread delta', 'ino', 'unread_delta'),
+	('entries', 'ino', 'unread_entries'),
+	('message', 'message', 'build'),
+	('notification', 'notif', 'send_notification')
+]
+
+'''
+=====================================================
+	Define the function run in the child process
+
+	*	Record the notifications instead of sending
+		them over D-Bus
+
+	*	Wrap the functions of each phase to add
+		up the time spent in them (nested phases
+		are included in their parent, e.g. token
+		recovery in http requests)
+
+	*	Run one polling cycle and print the wall
+		time and the phases as JSON
+=====================================================
+'''
+
+def child():
+	sys.path.insert(0, repo_dir)
+
+	sent = []
+	notif = types.ModuleType('notif')
+	notif.send_notification = lambda summary, body: sent.append(body)
+	sys.modules['notif'] = notif
+
+	start = time.perf_counter()
+
+	import ino
+
+	phases = {}
+
+	def timed(name, function):
+		def wrapper(*args, **kwargs):
+			phase_start = time.perf_counter()
+
+			try:
+				return function(*args, **kwargs)
+
+			finally:
+				phases[name] = phases.get(name, 0) + time.perf_counter() - phase_start
+
+		return wrapper
+
+	for name, module_name, function_name in PHASES:
+		module = sys.modules[module_name] if module_name in sys.modules else __import__(module_name)
+		setattr(module, function_name, timed(name, getattr(module, function_name)))
+
+	imported = time.perf_counter()
+	ino.poll(ino.load_state())
+	done = time.perf_counter()
+
+	phases['import'] = imported - start
+
+	print(json.dumps({
+		'wall': done - start,
+		'phases': phases,
+		'notification_lines': sum(body.count('\n') for body in sent)
+	}))
+
+'''
+=====================================================
+	Define a function to run one polling cycle in a
+	child process with the given home directory and
+	return its results with its peak RSS (in bytes)
+=====================================================
+'''
+
+def run_child(home):
+	env = dict(os.environ, HOME=home)
+	process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child'], env=env, stdout=subprocess.PIPE)
+	output = process.stdout.read()
+	process.stdout.close()
+
+	pid, status, rusage = os.wait4(process.pid, 0)
+	process.returncode = os.waitstatus_to_exitcode(status)
+
+	if process.returncode != 0:
+		raise RuntimeError('child process failed with exit code {}'.format(process.returncode))
+
+	results = json.loads(output.decode().strip().split('\n')[-1])
+
+	# ru_maxrss is in kilobytes on Linux
+	results['peak_rss'] = rusage.ru_maxrss * 1024
+	return results
+
+'''
+=====================================================
+	Define a function to measure the three runs of a
+	synthetic account of the given size
+=====================================================
+'''
+
+def measure(size, folders, latency):
+	from fakeserver import FakeAccount, FakeInoreader, inopy_config
+
+	account = FakeAccount(size, folders)
+	server = FakeInoreader(account, latency).start()
+	home = tempfile.mkdtemp(prefix='inopy-bench-')
+	results = {}
+
+	try:
+		config_dir = os.path.join(home, '.inopy/config')
+		os.makedirs(config_dir)
+
+		with open(os.path.join(config_dir, 'config.json'), 'w') as config_file:
+			json.dump(inopy_config(server.url, server.access_token, server.refresh_token), config_file, indent=4)
+
+		for scenario in ('cold', 'warm', 'expired token'):
+			if scenario == 'warm':
+				account.add_articles(10)
+
+			elif scenario == 'expired token':
+				account.add_articles(10)
+				server.expire_token()
+
+			server.reset_counts()
+			results[scenario] = run_child(home)
+			results[scenario]['requests'] = server.requests()
+
+	finally:
+		server.shutdown()
+		server.server_close()
+		shutil.rmtree(home)
+
+	return results
+
+def main():
+	if '--child' in sys.argv:
+		child()
+		return
+
+	parser = argparse.ArgumentParser(description='Benchmark Inopy against a fake Inoreader API server.')
+	parser.add_argument('sizes', type=int, nargs='*', default=[100, 10000, 100000], help='numbers of feeds (default: 100 10000 100000)')
+	parser.add_argument('--folders-ratio', type=float, default=0.01, help='number of folders per feed (default: 0.01)')
+	parser.add_argument('--latency', type=float, default=0, help='latency of every response in seconds (default: 0)')
+	parser.add_argument('--json', help='write the results to this JSON file')
+	args = parser.parse_args()
+
+	sys.path.insert(0, bench_dir)
+	all_results = {}
+
+	for size in args.sizes:
+		results = all_results[size] = measure(size, max(1, int(size * args.folders_ratio)), args.latency)
+
+		for scenario, result in results.items():
+			print(f'{size:>7} feeds | {scenario:<13} | wall {result["wall"] * 1e3:>8.1f} ms | peak RSS {result["peak_rss"] / 1e6:>6.1f} MB | {result["requests"]} requests')
+
+			for name, duration in sorted(result['phases'].items(), key=lambda item: item[1], reverse=True):
+				print(f'{"":>24}{name:<20} {duration * 1e3:>8.1f} ms')
+
+		print()
+
+	if args.json:
+		with open(args.json, 'w') as json_file:
+			json.dump(all_results, json_file, indent=4)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,140 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides an on-disk cache for the parsed API responses, stored in the /HOME/USER/.inopy/cache directory (in a subdirectory per account when several accounts are polled).
+
+	Each cache entry keeps the parsed data with the ETag and Last-Modified validators sent by the server and the time it was fetched. The entries are revalidated with conditional requests or, if the server sent no validators, considered fresh for a configurable time to live.
+
+=========================================================================================
+"""
+
+import os
+import json
+import time
+import logging
+
+# Set the path of the cache directory to /HOME/USER/.inopy/cache
+cache_dir = os.path.join(os.environ['HOME'], '.inopy/cache')
+
+def entry_path(name):
+	return os.path.join(cache_dir, name + '.json')
+
+'''
+==============================================
+	Define a function to load a cache entry.
+	Return None if the entry does not exist or
+	cannot be read
+==============================================
+'''
+
+def load_entry(name):
+	try:
+		with open(entry_path(name)) as cache_file:
+			return json.load(cache_file)
+
+	except FileNotFoundError:
+		return None
+
+	except Exception as e:
+		logging.debug(e)
+		return None
+
+'''
+================================================
+	Define a function to write a cache entry.
+
+	The entry is first written to a temporary
+	file which then replaces the previous one,
+	so that a concurrent run never reads a half
+	written entry
+================================================
+'''
+
+def write_entry(name, entry):
+	path = entry_path(name)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	temp_path = '{}.{}.tmp'.format(path, os.getpid())
+
+	with open(temp_path, 'w') as cache_file:
+		json.dump(entry, cache_file, separators=(',', ':'))
+
+	os.replace(temp_path, path)
+
+'''
+================================================
+	Define a function to create a cache entry
+	from a response and its parsed data, keeping
+	the validators sent by the server, and save
+	it
+================================================
+'''
+
+def save_entry(name, response, data):
+	entry = {
+		'etag': response.headers.get('ETag'),
+		'last_modified': response.headers.get('Last-Modified'),
+		'fetched_at': time.time(),
+		'data': data
+	}
+
+	write_entry(name, entry)
+	return entry
+
+'''
+================================================
+	Define a function to mark a cache entry as
+	revalidated (e.g. after a 304 Not Modified
+	response) and save it
+================================================
+'''
+
+def touch_entry(name, entry):
+	entry['fetched_at'] = time.time()
+	write_entry(name, entry)
+
+'''
+================================================
+	Define a function to check if a cache entry
+	can be used without any request: the server
+	sent no validators and the entry is younger
+	than the time to live (in seconds)
+================================================
+'''
+
+def is_fresh(entry, ttl):
+	if entry is None or entry['etag'] or entry['last_modified']:
+		return False
+
+	return time.time() - entry['fetched_at'] < ttl
+
+'''
+================================================
+	Define a function to get the headers of a
+	conditional request revalidating a cache
+	entry
+================================================
+'''
+
+def conditional_headers(entry):
+	headers = {}
+
+	if entry is not None:
+		if entry['etag']:
+			headers['If-None-Match'] = entry['etag']
+
+		if entry['last_modified']:
+			headers['If-Modified-Since'] = entry['last_modified']
+
+	return headers
@@ -25,14 +25,19 @@
 
 	The create_file function is called if the configuration file should be created. It prompts the user to enter configuration details and save them in the config file.
 
-	Finally the config function serves as a wrapper function that sets the paths and calls get_config to retrieve the configuration data.
+	The ConfigStore class keeps the parsed configuration in memory and reloads it only when the config file changes (checked with the file modification time, or with inotify in long-running modes). It writes the config file atomically under a lock (temporary file and rename), so that concurrent runs never read a half-written file.
+
+	Finally the config function serves as a wrapper function that sets the paths and calls get_config to retrieve the configuration data. The accounts function reads the optional accounts file listing the config files of several Inoreader accounts.
 	
 =========================================================================================
 """
 
 import json
 import os
+import fcntl
+import struct
 import logging
+import threading
 from logs import LogFile
 
 # Set logs file
@@ -46,10 +51,7 @@ log_file = LogFile()
 	If the config file or the config directory don't exist
 	create them.
 	
-	Read the config file and load its contents into a dictionary.
-
-	Extract the necessary values from the config dictionary,
-	create a dictionary of local variables and return it.
+	Get the configuration data from the config store.
 ================================================================
 '''
 
@@ -74,11 +76,20 @@ def get_config(config_path, config_file_path):
 		logging.info(f'{config_path} created!')
 
 		create_file(config_file_path)
-	
-	# load config content
-	with open(config_file_path) as config_file:
-		config = json.load(config_file)
-	
+
+	return get_store(config_file_path).values()
+
+'''
+================================================================
+	Create a function to extract the necessary values from
+	the config dictionary, create a dictionary of local
+	variables and return it.
+================================================================
+'''
+
+def get_variables(config, config_file_path):
+	config_path = os.path.dirname(config_file_path)
+
 	# Extract the necessary values from the config dictionary
 	bearer = config['oauth']['bearer']
 	refresh_token = config['oauth']['refresh_token']
@@ -89,6 +100,9 @@ def get_config(config_path, config_file_path):
 	scope = config['oauth']['scope']
 	csrf = config['oauth']['csrf']
 	home_url = config['oauth']['home_url']
+	expires_at = config['oauth'].get('expires_at', 0)
+	refresh_margin = int(config['oauth'].get('refresh_margin', 300))
+	oauth_timeout = int(config['oauth'].get('timeout', 300))
 
 	unread_counts_url = config['inoapi']['unread_counts_url']
 	feeds_list_url = config['inoapi']['feeds_list_url']
@@ -101,6 +115,38 @@ def get_config(config_path, config_file_path):
 	browser_path = config['prod']['browser_path']
 	host = config['prod']['host']
 	port = config['prod']['port']
+
+	# Optional settings missing from older config files
+	interval = int(config.get('daemon', {}).get('interval', 60))
+	quota_threshold = float(config.get('daemon', {}).get('quota_threshold', 0.8))
+	adaptive = config.get('daemon', {}).get('adaptive', 'true') == 'true'
+	min_interval = int(config.get('daemon', {}).get('min_interval', 60))
+	max_interval = int(config.get('daemon', {}).get('max_interval', 900))
+	pool_size = int(config.get('http', {}).get('pool_size', 4))
+	concurrency = int(config.get('http', {}).get('concurrency', 2))
+	deadline = float(config.get('http', {}).get('deadline', 60))
+	connect_timeout = float(config.get('http', {}).get('connect_timeout', 5))
+	read_timeout = float(config.get('http', {}).get('read_timeout', 20))
+	retries = int(config.get('http', {}).get('retries', 2))
+	backoff = float(config.get('http', {}).get('backoff', 0.5))
+	breaker_threshold = int(config.get('http', {}).get('breaker_threshold', 3))
+	breaker_cooldown = int(config.get('http', {}).get('breaker_cooldown', 300))
+	cache_ttl = int(config.get('cache', {}).get('ttl', 3600))
+	metrics_file = os.path.expanduser(config.get('metrics', {}).get('file', ''))
+	incremental = config['notification'].get('incremental', 'true') == 'true'
+	more_feeds = config['notification'].get('more_feeds', '+{feeds} more feeds ({articles} articles)')
+	max_lines = int(config['notification'].get('max_lines', 10))
+	max_chars = int(config['notification'].get('max_chars', 1000))
+	group_by_folder = config['notification'].get('group_by_folder', 'false') == 'true'
+	headlines = int(config['notification'].get('headlines', 0))
+	headlines_cache = int(config['notification'].get('headlines_cache', 500))
+	filter_rules = config.get('filters', {}).get('rules', [])
+	status_socket = os.path.expanduser(config.get('status', {}).get('socket', '~/.inopy/inopy.sock'))
+	log_level = config.get('logging', {}).get('level', 'DEBUG')
+	log_max_bytes = int(config.get('logging', {}).get('max_bytes', 1048576))
+	log_backup_count = int(config.get('logging', {}).get('backup_count', 5))
+	log_when = config.get('logging', {}).get('when', '')
+	log_compress = config.get('logging', {}).get('compress', 'true') == 'true'
 	
 	variables = locals()
 	return variables
@@ -150,7 +196,10 @@ def create_file(config_file_path):
 		"callback": callback,
 		"scope": scope,
 		"csrf": "4902358490258",
-		"home_url": "http://localhost:5000"
+		"home_url": "http://localhost:5000",
+		"expires_at": 0,
+		"refresh_margin": 300,
+		"timeout": 300
 	}
 
 	config["inoapi"] = {
@@ -161,7 +210,14 @@ def create_file(config_file_path):
 	config["notification"] = {
 		"summary": summary,
 		"singular_article": singular_article,
-		"plural_articles": plural_articles
+		"plural_articles": plural_articles,
+		"incremental": "true",
+		"more_feeds": "+{feeds} more feeds ({articles} articles)",
+		"max_lines": 10,
+		"max_chars": 1000,
+		"group_by_folder": "false",
+		"headlines": 0,
+		"headlines_cache": 500
 	}
 
 	config["prod"] = {
@@ -171,33 +227,289 @@ def create_file(config_file_path):
 		"port": "5000"
 	}
 
+	config["daemon"] = {
+		"interval": 60,
+		"quota_threshold": 0.8,
+		"adaptive": "true",
+		"min_interval": 60,
+		"max_interval": 900
+	}
+
+	config["http"] = {
+		"pool_size": 4,
+		"concurrency": 2,
+		"deadline": 60,
+		"connect_timeout": 5,
+		"read_timeout": 20,
+		"retries": 2,
+		"backoff": 0.5,
+		"breaker_threshold": 3,
+		"breaker_cooldown": 300
+	}
+
+	config["cache"] = {
+		"ttl": 3600
+	}
+
+	config["metrics"] = {
+		"file": ""
+	}
+
+	config["filters"] = {
+		"rules": []
+	}
+
+	config["status"] = {
+		"socket": "~/.inopy/inopy.sock"
+	}
+
+	config["logging"] = {
+		"level": "DEBUG",
+		"max_bytes": 1048576,
+		"backup_count": 5,
+		"when": "",
+		"compress": "true"
+	}
+
 	# Write the config data to the config file
-	with open(config_file_path, "w") as file:
-		json.dump(config, file, indent=4)
+	write_file(config_file_path, config)
 
 	#print(f"{config_file_path} created successfully!")
 	logging.info(f'Created config file at {config_file_path}!')
 
+'''
+==========================================================
+	Create a function to write the config data atomically:
+	the data is written to a temporary file which then
+	replaces the config file
+==========================================================
+'''
+
+def write_file(config_file_path, config):
+	temp_path = '{}.{}.tmp'.format(config_file_path, os.getpid())
+
+	with open(temp_path, "w") as file:
+		json.dump(config, file, indent=4)
+
+	os.replace(temp_path, config_file_path)
+
+'''
+==========================================================
+	Create a function to watch the changes of a file with
+	inotify and set an event when it is written or
+	replaced.
+
+	The directory is watched instead of the file because
+	an atomic write replaces the file (and its inode).
+
+	Return False if inotify is not available.
+==========================================================
+'''
+
+# inotify constants (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+def watch_file(path, event):
+	try:
+		import ctypes
+		import ctypes.util
+
+		libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+		fd = libc.inotify_init1(os.O_CLOEXEC)
+
+		if fd < 0 or libc.inotify_add_watch(fd, os.path.dirname(path).encode(), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+			return False
+
+	except Exception as e:
+		logging.debug(e)
+		return False
+
+	name = os.path.basename(path).encode()
+
+	def read_events():
+		while True:
+			buffer = os.read(fd, 4096)
+			offset = 0
+
+			# Each event is a struct inotify_event followed by the file name
+			while offset < len(buffer):
+				wd, mask, cookie, length = struct.unpack_from('iIII', buffer, offset)
+				event_name = buffer[offset + 16:offset + 16 + length].rstrip(b'\0')
+				offset += 16 + length
+
+				if event_name == name:
+					event.set()
+
+	threading.Thread(target=read_events, daemon=True).start()
+	return True
+
+'''
+==========================================================
+	Create a class to store the configuration data
+
+	*	data returns the parsed config file, reloaded only
+		if the file modification time or size changed (or,
+		when the file is watched, only after an inotify
+		event)
+
+	*	values returns the dictionary of the necessary
+		values extracted from the config data
+
+	*	update applies changes (e.g. new tokens) to the
+		config file: under an exclusive lock, the current
+		file is reloaded, updated and written atomically
+
+	*	watch starts watching the config file with inotify
+		(e.g. in daemon mode)
+==========================================================
+'''
+
+class ConfigStore:
+
+	def __init__(self, config_file_path):
+		self.path = config_file_path
+		self.lock_path = config_file_path + '.lock'
+		self.stamp = None
+		self.config = None
+		self.variables = None
+		self.watched = False
+		self.changed = threading.Event()
+
+	def file_stamp(self):
+		stat = os.stat(self.path)
+		return (stat.st_mtime_ns, stat.st_size)
+
+	def load(self):
+		stamp = self.file_stamp()
+
+		with open(self.path) as config_file:
+			self.config = json.load(config_file)
+
+		self.stamp = stamp
+		self.variables = get_variables(self.config, self.path)
+
+	def data(self):
+		if self.config is None or not self.watched or self.changed.is_set():
+			self.changed.clear()
+
+			if self.file_stamp() != self.stamp:
+				self.load()
+
+		return self.config
+
+	def values(self):
+		self.data()
+		return self.variables
+
+	def update(self, changes):
+		with open(self.lock_path, 'w') as lock_file:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+			try:
+				with open(self.path) as config_file:
+					config = json.load(config_file)
+
+				for section, values in changes.items():
+					config.setdefault(section, {}).update(values)
+
+				write_file(self.path, config)
+				self.load()
+
+			finally:
+				fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+	def watch(self):
+		if not self.watched:
+			self.watched = watch_file(self.path, self.changed)
+
+		return self.watched
+
+'''
+==============================================
+	Create a function to get the config store
+	of a config file, created the first time
+==============================================
+'''
+
+stores = {}
+
+def get_store(config_file_path):
+	store = stores.get(config_file_path)
+
+	if store is None:
+		store = stores[config_file_path] = ConfigStore(config_file_path)
+
+	return store
+
 '''
 ==============================================
 	Create a function to set the paths for the
-	config directory and file.
+	config directory and file (unless the path
+	of the config file of an account is given).
 	
 	Get the configuration data and return it.
+	The config directory and file are only
+	checked the first time.
 ==============================================
 '''
 
-def config():
+def config(config_file_path=None):
 	
 	# Set the path of config file to
 	# /HOME/USER/.config/inopy/config.json
-	config_path = os.path.join(os.environ['HOME'], '.inopy/config')
-	config_file = 'config.json'
-	config_file_path = os.path.join(config_path, config_file)
+	if config_file_path is None:
+		config_path = os.path.join(os.environ['HOME'], '.inopy/config')
+		config_file = 'config.json'
+		config_file_path = os.path.join(config_path, config_file)
+
+	else:
+		config_path = os.path.dirname(config_file_path)
 	
 	# Get and return the configuration data
+	if config_file_path in stores:
+		return stores[config_file_path].values()
+
 	data = get_config(config_path, config_file_path)
 	return data
 
+'''
+==============================================================
+	Create a function to read the optional accounts file
+	/HOME/USER/.inopy/config/accounts.json, e.g.:
+
+	{
+		"workers": 4,
+		"accounts": {
+			"personal": "config.json",
+			"team": "team.json"
+		}
+	}
+
+	Each account has its own config file (same format as
+	config.json, relative paths are resolved from the config
+	directory) and thus its own tokens.
+
+	Return the list of (name, config file path) and the number
+	of workers polling the accounts, or None if there is no
+	accounts file.
+==============================================================
+'''
+
+def accounts():
+	config_path = os.path.join(os.environ['HOME'], '.inopy/config')
+	accounts_file_path = os.path.join(config_path, 'accounts.json')
+
+	if not os.path.exists(accounts_file_path):
+		return None
+
+	with open(accounts_file_path) as accounts_file:
+		data = json.load(accounts_file)
+
+	accounts = [(name, os.path.join(config_path, path)) for name, path in data['accounts'].items()]
+	workers = int(data.get('workers', 4))
+
+	return accounts, workers
+
 if __name__ == '__main__':
 	config = config()
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides the feed registry used to look up the subscriptions (feeds) and categories (folders) returned by the Inoreader API.
+
+	Feeds and folders are stored as compact records in dictionaries indexed by their interned ids, so that every lookup made while building the notification takes constant time whatever the number of subscriptions.
+
+=========================================================================================
+"""
+
+import sys
+
+# Version of the registry data (the cached data of another version is ignored)
+DATA_VERSION = 2
+
+'''
+============================================
+	Define the records stored in the
+	registry. __slots__ avoids a dictionary
+	per record on accounts with thousands
+	of subscriptions
+============================================
+'''
+
+class Feed:
+	__slots__ = ('id', 'title', 'folders')
+
+	def __init__(self, feed_id, title, folders):
+		self.id = feed_id
+		self.title = title
+		self.folders = folders
+
+class Folder:
+	__slots__ = ('id',)
+
+	def __init__(self, folder_id):
+		self.id = folder_id
+
+'''
+==================================================
+	Define the registry of feeds and folders
+
+	*	add_subscription adds a subscription of
+		the feeds list API response, in all the
+		folders (categories) it belongs to
+
+	*	title returns the title of a feed, or
+		the last part of the id for an unknown
+		one (e.g. a tag or a state)
+
+	*	is_folder checks if an unread id is a
+		folder
+
+	*	folders_of returns the folder ids of a
+		feed (none for an unknown one)
+
+	*	aggregate splits unread counts into the
+		counts of the feeds and the totals of the
+		folders in a single pass (see below)
+
+	*	to_data and from_data convert the
+		registry to and from a JSON serializable
+		dictionary (e.g. for the cache). Data of
+		an older version raises a ValueError
+==================================================
+'''
+
+class FeedRegistry:
+	__slots__ = ('feeds', 'folders')
+
+	def __init__(self):
+		self.feeds = {}
+		self.folders = {}
+
+	def __contains__(self, feed_id):
+		return feed_id in self.feeds
+
+	def __len__(self):
+		return len(self.feeds)
+
+	def add_feed(self, feed_id, title, folder_ids=()):
+		feed_id = sys.intern(feed_id)
+		folders = tuple(sys.intern(folder_id) for folder_id in folder_ids)
+
+		for folder_id in folders:
+			if folder_id not in self.folders:
+				self.folders[folder_id] = Folder(folder_id)
+
+		self.feeds[feed_id] = Feed(feed_id, title, folders)
+
+	def add_subscription(self, subscribed):
+		folder_ids = [category['id'] for category in subscribed['categories']]
+		self.add_feed(subscribed['id'], subscribed['title'], folder_ids)
+
+	def title(self, feed_id):
+		feed = self.feeds.get(feed_id)
+		return feed.title if feed is not None else feed_id.split('/')[-1]
+
+	def is_folder(self, unread_id):
+		return unread_id in self.folders
+
+	def folders_of(self, feed_id):
+		feed = self.feeds.get(feed_id)
+		return feed.folders if feed is not None else ()
+
+	'''
+	==================================================
+		Split unread counts in a single pass:
+
+		*	The folder ids are skipped: their counts
+			are worked out from their feeds
+
+		*	Every other id is counted as a feed. The
+			count of a feed is added to the total of
+			each of its folders (a feed in several
+			folders counts in all of them), together
+			with its id
+
+		*	The feeds without folder (or unknown) are
+			listed as unfiled
+
+		The folders of each feed are recorded once
+		when the registry is built; the groups only
+		hold the unread feeds, so a pass costs the
+		number of unread ids rather than the number
+		of subscriptions
+
+		Return the feed counts, the folder totals
+		and feed ids, and the unfiled feed ids
+	==================================================
+	'''
+
+	def aggregate(self, unreadcounts):
+		feeds = {}
+		folders = {}
+		unfiled = []
+
+		for unread_id, count in unreadcounts.items():
+			if unread_id in self.folders:
+				continue
+
+			feeds[unread_id] = count
+			feed = self.feeds.get(unread_id)
+
+			if feed is None or not feed.folders:
+				unfiled.append(unread_id)
+				continue
+
+			for folder_id in feed.folders:
+				group = folders.get(folder_id)
+
+				if group is None:
+					folders[folder_id] = [count, [unread_id]]
+
+				else:
+					group[0] += count
+					group[1].append(unread_id)
+
+		return feeds, folders, unfiled
+
+	def to_data(self):
+		return {'version': DATA_VERSION, 'feeds': [[feed.id, feed.title, list(feed.folders)] for feed in self.feeds.values()]}
+
+	@classmethod
+	def from_data(cls, data):
+		if not isinstance(data, dict) or data.get('version') != DATA_VERSION:
+			raise ValueError('outdated feed registry data')
+
+		registry = cls()
+
+		for feed_id, title, folder_ids in data['feeds']:
+			registry.add_feed(feed_id, title, folder_ids)
+
+		return registry
@@ -0,0 +1,249 @@
+"""
+=========================================================================================
+
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides the filter rules of the notification: the user rules of the config file select the feeds by id prefix, folder or title regular expression, and include, exclude or prioritize them or set their minimum count.
+
+	The rules are compiled once into indexes (a prefix trie for the ids, a dictionary for the folders and a single alternation of all the title regular expressions), so that the cost of evaluating a feed does not grow with the number of rules.
+
+=========================================================================================
+"""
+
+import re
+import logging
+
+# Key of the rules ending at a node of the prefix trie (no character is empty)
+MATCHES = ''
+
+# Global inline flags at the start of a regular expression (e.g. (?i))
+GLOBAL_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+'''
+==================================================
+	Define a function to get the label of a folder
+	from its id (e.g. user/-/label/News gives
+	News), so that a folder rule can be written
+	with its label or its id
+==================================================
+'''
+
+def label(folder_id):
+	return folder_id.rsplit('/label/', 1)[-1]
+
+'''
+==================================================
+	Define a function to wrap a regular expression
+	in a group before merging it with the others.
+	Its global inline flags (e.g. (?i) for case
+	insensitive) only apply to its own group
+==================================================
+'''
+
+def scoped(pattern):
+	flags = GLOBAL_FLAGS.match(pattern)
+
+	if flags is None:
+		return '(?:{})'.format(pattern)
+
+	return '(?{}:{})'.format(flags.group(1), pattern[flags.end():])
+
+'''
+==================================================
+	Define the compiled set of filter rules
+
+	Each rule has a single selector:
+
+	*	id_prefix: the feed ids starting with it,
+		indexed in a prefix trie (one step per
+		character of the id, stopping as soon as
+		no rule prefix continues)
+
+	*	folder: the feeds of a folder (label or
+		id), indexed by label
+
+	*	title: the feeds whose title matches a
+		regular expression. All of them are merged
+		into one alternation, which rejects most
+		titles in a single search; only the titles
+		it matches are checked rule by rule. The
+		regular expressions with capture groups
+		(e.g. backreferences) are not merged, as
+		merging renumbers the groups: they are
+		checked by themselves
+
+	and its effects:
+
+	*	action: "include" (only the feeds matching
+		an include rule are notified, if there is
+		any) or "exclude" (never notified)
+
+	*	priority: feeds with a higher priority are
+		listed first in the notification (the
+		highest priority of the matching rules)
+
+	*	min_count: feeds are only notified from
+		this count (the highest minimum of the
+		matching rules)
+
+	The priority and min_count may be written as
+	strings like the other settings of the config
+	file (e.g. "10"). An invalid rule (e.g. no
+	selector, a wrong regular expression or a
+	priority which is not a number) is logged and
+	ignored
+==================================================
+'''
+
+class RuleSet:
+
+	def __init__(self, rules=()):
+		self.rules = []
+		self.trie = {}
+		self.folders = {}
+		self.patterns = []
+		self.separate = []
+		self.titles = None
+		self.includes = False
+
+		for rule in rules:
+			try:
+				self.add(rule)
+
+			except Exception as e:
+				logging.debug(f'Invalid filter rule {rule}: {e}')
+
+		# Merging renumbers the capture groups: the backreferences would point to the wrong group
+		merged = [(index, pattern) for index, pattern in self.patterns if pattern.groups == 0]
+		self.separate = [(index, pattern) for index, pattern in self.patterns if pattern.groups > 0]
+		self.patterns = merged
+
+		if merged:
+			try:
+				self.titles = re.compile('|'.join(scoped(pattern.pattern) for index, pattern in merged))
+
+			except re.error as e:
+				# Check every title rule by itself instead
+				logging.debug(f'Title filter rules not merged: {e}')
+				self.separate.extend(merged)
+				self.patterns = []
+
+	def __len__(self):
+		return len(self.rules)
+
+	def add(self, rule):
+		action = rule.get('action')
+
+		if action not in (None, 'include', 'exclude'):
+			raise ValueError(f'unknown action {action}')
+
+		priority = int(rule['priority']) if rule.get('priority') is not None else None
+		effects = (action, priority, int(rule.get('min_count', 1)))
+		index = len(self.rules)
+
+		if 'id_prefix' in rule:
+			node = self.trie
+
+			for char in rule['id_prefix']:
+				node = node.setdefault(char, {})
+
+			self.rules.append(effects)
+			node.setdefault(MATCHES, []).append(index)
+
+		elif 'folder' in rule:
+			self.rules.append(effects)
+			self.folders.setdefault(label(rule['folder']), []).append(index)
+
+		elif 'title' in rule:
+			pattern = re.compile(rule['title'])
+			self.rules.append(effects)
+			self.patterns.append((index, pattern))
+
+		else:
+			raise ValueError('no id_prefix, folder or title selector')
+
+		self.includes = self.includes or action == 'include'
+
+	def matches(self, feed_id, title, folder_ids):
+		node = self.trie
+		indices = list(node.get(MATCHES, ()))
+
+		for char in feed_id:
+			node = node.get(char)
+
+			if node is None:
+				break
+
+			indices.extend(node.get(MATCHES, ()))
+
+		for folder_id in folder_ids:
+			indices.extend(self.folders.get(label(folder_id), ()))
+
+		if self.titles is not None and self.titles.search(title):
+			indices.extend(index for index, pattern in self.patterns if pattern.search(title))
+
+		indices.extend(index for index, pattern in self.separate if pattern.search(title))
+
+		return indices
+
+	'''
+	==================================================
+		Return the priority of a feed, or None if it
+		must not be notified
+	==================================================
+	'''
+
+	def evaluate(self, feed_id, title, folder_ids, count):
+		if not self.rules:
+			return 0
+
+		included = not self.includes
+		priority = None
+		min_count = 1
+
+		for index in self.matches(feed_id, title, folder_ids):
+			action, rule_priority, rule_min_count = self.rules[index]
+
+			if action == 'exclude':
+				return None
+
+			if action == 'include':
+				included = True
+
+			if rule_priority is not None:
+				priority = rule_priority if priority is None else max(priority, rule_priority)
+
+			min_count = max(min_count, rule_min_count)
+
+		if not included or count < min_count:
+			return None
+
+		return priority or 0
+
+	'''
+	==================================================
+		Select the unread feeds to notify: return a
+		dictionary of their count and priority
+	==================================================
+	'''
+
+	def select(self, registry, unreadcounts):
+		selected = {}
+
+		for unread_id, count in unreadcounts.items():
+			priority = self.evaluate(unread_id, registry.title(unread_id), registry.folders_of(unread_id), count)
+
+			if priority is not None:
+				selected[unread_id] = (count, priority)
+
+		return selected
@@ -0,0 +1,128 @@
+"""
+=========================================================================================
+
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides the helpers used to preview the newest headlines of the feeds with new unread articles.
+
+	The ids of the newest unread items of a feed are listed with the stream item ids API (paginated with continuation tokens) and the titles of the items which are not known yet are fetched in batches with the stream item contents API. The titles are kept in a small LRU cache indexed by item id, so that a headline is only downloaded once.
+
+=========================================================================================
+"""
+
+from collections import OrderedDict
+from urllib.parse import urlencode, urljoin
+
+# Stream of the read items, excluded from the item ids
+READ_STREAM = 'user/-/state/com.google/read'
+
+# Maximum number of item ids per item contents request
+BATCH_SIZE = 100
+
+'''
+============================================
+	Define a class keeping the titles of the
+	last items seen, indexed by item id
+
+	*	get moves the item to the end (most
+		recently used)
+
+	*	put adds or moves the item to the end
+		and drops the least recently used
+		items above the size
+
+	*	to_data and from_data convert the
+		cache to and from a list of [id, title]
+		pairs stored in the cache directory
+============================================
+'''
+
+class HeadlineCache:
+
+	def __init__(self, size=500):
+		self.size = size
+		self.items = OrderedDict()
+		self.changed = False
+
+	def get(self, item_id):
+		title = self.items.get(item_id)
+
+		if title is not None:
+			self.items.move_to_end(item_id)
+
+		return title
+
+	def put(self, item_id, title):
+		self.items[item_id] = title
+		self.items.move_to_end(item_id)
+		self.changed = True
+
+		while len(self.items) > self.size:
+			self.items.popitem(last=False)
+
+	def __contains__(self, item_id):
+		return item_id in self.items
+
+	def to_data(self):
+		return [[item_id, title] for item_id, title in self.items.items()]
+
+	@classmethod
+	def from_data(cls, data, size=500):
+		cache = cls(size)
+
+		for item_id, title in data or []:
+			cache.put(item_id, title)
+
+		cache.changed = False
+		return cache
+
+'''
+============================================
+	Define functions to get the URLs of the
+	stream item ids and stream item contents
+	requests (next to the unread counts
+	endpoint of the API)
+============================================
+'''
+
+def ids_url(unread_counts_url, feed_id, count, continuation=None):
+	params = {'s': feed_id, 'n': count, 'xt': READ_STREAM}
+
+	if continuation:
+		params['c'] = continuation
+
+	return urljoin(unread_counts_url, 'stream/items/ids') + '?' + urlencode(params)
+
+def contents_urls(unread_counts_url, item_ids):
+	url = urljoin(unread_counts_url, 'stream/items/contents')
+
+	return [
+		url + '?' + urlencode([('i', item_id) for item_id in item_ids[i:i + BATCH_SIZE]])
+		for i in range(0, len(item_ids), BATCH_SIZE)
+	]
+
+'''
+============================================
+	Define a function to get the short
+	(decimal) id of an item from its long
+	id (tag:google.com,2005:reader/item/
+	followed by the hexadecimal id), as
+	listed by the stream item ids API
+============================================
+'''
+
+def short_id(item_id):
+	if item_id.startswith('tag:'):
+		return str(int(item_id.rsplit('/', 1)[-1], 16))
+
+	return item_id
@@ -27,265 +27,951 @@
 
 	Inopy is structured into functions and modules for making API requests, parsing response data, refreshing tokens, sending notifications and logging the processes.
 
+	Several Inoreader accounts can be polled at once (see the accounts function of the config module): the accounts are checked concurrently on a bounded thread pool sharing the HTTP connection pool, and a single merged notification is sent.
+
+	Inopy can either run once (e.g. from a cron job) or as a long-running daemon with the --daemon option. In daemon mode the configuration, the HTTP connections, the D-Bus proxy and the parsed feeds are kept in memory between polling cycles.
+
 	For more information about OAuth authentication, plase see <https://www.inoreader.com/developers/oauth>
 
 =========================================================================================
 """
 
-import requests
-import json
-import notif
+import time
+import heapq
+import cache
+import activity
+import message
+import headlines
+import metrics
+import parsing
+import ratelimit
+import status
+import logs
 import logging
-from config import config
-from oauth import run_app
-from refresh import refresh
+import threading
+import transport
+from feeds import FeedRegistry
+from filters import RuleSet
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from config import config, accounts, get_store
 from logs import LogFile
 
+'''
+============================================
+	The OAuth stack (Flask, waitress), the
+	token refreshing, the D-Bus notification
+	and the daemon scheduler modules are
+	imported only when they are needed, so
+	that the common "200 OK, nothing unread"
+	path only loads what it uses
+============================================
+'''
+
 # Set logs file
 log_file = LogFile()
 
 '''
 ===========================================
 	Define functions to make an API request
-	with bearer token and parse response
-	data as JSON
+	with bearer token (and optional extra
+	headers, optionally streamed) and parse
+	response data as JSON from its bytes
 ===========================================
 '''
 
-def APIrequest(url, bearer):
+def APIrequest(url, bearer, session=None, extra_headers=None, stream=False):
+	session = session or transport.get_session()
 	bearer_string = 'Bearer {}'.format(bearer)
 	headers = {'Authorization': bearer_string}
-	response = requests.get(url, headers=headers)
+	headers.update(extra_headers or {})
+	response = session.get(url, headers=headers, stream=stream)
 	return response
 
 def getData(response):
-	data = json.loads(response.text)
+	data = parsing.loads(response.content)
 	return data
 
 '''
-===================================
-	Initialize an empty message
-	string for the notification
-===================================
+=============================================
+	Define a function to load configuration
+	settings (of the default account or of a
+	named account) and create the state kept
+	between two polling cycles:
+
+	*	The account name (None for the
+		default account)
+
+	*	The configuration dictionary
+
+	*	The current bearer token
+
+	*	The HTTP session shared with the
+		refresh and oauth modules, keeping
+		the connections to Inoreader alive
+
+	*	The registry of the subscriptions
+		(feeds) and categories (folders),
+		loaded from the cache if available
+
+	*	The unread snapshot of the previous
+		cycle, loaded from the cache
+
+	*	The API rate limits quota, loaded from
+		the cache, and the number of requests
+		made during the last cycle
+
+	*	The cache of the headlines already
+		downloaded, loaded from the cache
+
+	*	The activity history of the feeds (new
+		articles per hour of the day), loaded
+		from the cache
+
+	*	The filter rules, compiled from the
+		config
+=============================================
 '''
 
-message = ""
+def load_state(config_file_path=None, name=None):
+	conf = config(config_file_path)
+
+	state = {
+		'name': name,
+		'config': conf,
+		'bearer': conf['bearer'],
+		'session': configure_transport(conf),
+		'registry': FeedRegistry(),
+		'requests': 0
+	}
+
+	state['feeds_cache'] = cache.load_entry(cache_name(state, 'feeds'))
+	state['unread_snapshot'] = cache.load_entry(cache_name(state, 'unread')) or {}
+	state['pending_snapshot'] = None
+	state['unknown_feeds'] = cache.load_entry(cache_name(state, 'unknown')) or []
+	state['quota'] = cache.load_entry(cache_name(state, 'ratelimit')) or {}
+	state['activity'] = cache.load_entry(cache_name(state, 'activity')) or activity.new_history()
+	state['headlines'] = headlines.HeadlineCache.from_data(cache.load_entry(cache_name(state, 'headlines')), conf['headlines_cache'])
+
+	if state['feeds_cache'] is not None:
+		try:
+			state['registry'] = FeedRegistry.from_data(state['feeds_cache']['data'])
+
+		except ValueError as e:
+			# Get the whole feeds list again
+			logging.debug(e)
+			state['feeds_cache'] = None
+
+	update_filters(state)
+
+	return state
 
 '''
-===========================================
-	Load configuration settings and
-	retrieve necessary configuration values
-===========================================
+=============================================
+	Define a function to apply the timeouts,
+	retries and circuit breaker settings of
+	the config to the shared HTTP session and
+	return it
+=============================================
 '''
 
-config = config()
+def configure_transport(conf):
+	transport.configure(
+		connect_timeout=conf['connect_timeout'],
+		read_timeout=conf['read_timeout'],
+		retries=conf['retries'],
+		backoff=conf['backoff'],
+		breaker_threshold=conf['breaker_threshold'],
+		breaker_cooldown=conf['breaker_cooldown']
+	)
 
-bearer = config['bearer']
-unread_counts_url = config['unread_counts_url']
-feeds_list_url = config['feeds_list_url']
-config_path = config['config_file_path']
-endpoint = config['endpoint']
-client_id = config['client_id']
-client_secret = config['client_secret']
-refresh_token = config['refresh_token']
-summary = config['summary']
-singular_article = config['singular_article']
-plural_articles = config['plural_articles']
+	return transport.get_session(conf['pool_size'])
 
 '''
-=========================================
-	Create dictionaries and list to store
-	unread counts, subscriptions and feed
-	categories (folders)
-=========================================
+=============================================
+	Define a function to get the name of a
+	cache entry of the account of a state
+	(stored in a subdirectory per account)
+=============================================
 '''
 
-unreadcounts = {}
-subscriptions = {}
-categories = []
+def cache_name(state, name):
+	return name if state['name'] is None else '{}/{}'.format(state['name'], name)
 
-# Make API request to get unread counts
+'''
+=============================================
+	Define a function to reload the account
+	configuration from the config store and
+	keep the current tokens in memory
+=============================================
+'''
 
-try:
-	unread_response = APIrequest(unread_counts_url, bearer)
+def reload_config(state):
+	state['config'] = config(state['config']['config_file_path'])
+	state['bearer'] = state['config']['bearer']
 
-except Exception as e:
-	logging.debug(e)
+'''
+=============================================
+	Define a function to compile the filter
+	rules of the config, only when they
+	changed
+=============================================
+'''
+
+def update_filters(state):
+	rules = state['config']['filter_rules']
+
+	if state.get('filter_rules') != rules:
+		state['filters'] = RuleSet(rules)
+		state['filter_rules'] = rules
 
 '''
 ===================================================
+	Define a function to recover the bearer token
+	after a failed API request.
+
 	If the response status code is 403 (Forbidden):
 
-	*	Run the Flask app to get a bearer token
-	
-	*	Load the updated configuration file
-	
-	*	Update the bearer token with the new value
-		from the updated config and make a new API
-		request with the updated bearer token
+	*	Run the Flask app to get a bearer token.
+		Only one OAuth process runs at a time
+		(e.g. when several accounts are polled)
+		and it returns once the token is saved
+		or after the OAuth timeout. The run
+		deadline does not apply while the user
+		logs in, and starts again afterwards
+
+	If the response status code is 401
+	(Unauthorized):
+
+	*	Refresh the bearer token, unless another
+		process already refreshed it
+
+	In both cases load the updated configuration
+	file and update the bearer token with the new
+	value
 ===================================================
 '''
 
+oauth_lock = threading.Lock()
+
+def recover_token(state, status_code):
+	conf = state['config']
+
+	# Check for 403 error case
+	if status_code == 403:
+		logging.info('Token not available: starting oauth process...')
+		from oauth import run_app
+
+		with oauth_lock, metrics.span('oauth'):
+			# The user may take longer than the run deadline to log in
+			transport.start_deadline(None)
+
+			try:
+				if not run_app(conf['config_file_path']):
+					logging.info('OAuth process did not complete: keeping current token...')
+
+			finally:
+				# Bound the requests sent after the recovery by a new deadline
+				transport.start_deadline(conf['deadline'])
+
+	# Check for 401 error case
+	elif status_code == 401:
+		logging.info('Token expired: starting refresh process...')
+		from refresh import ensure_token
+		ensure_token(conf['config_file_path'], conf['endpoint'], conf['client_id'], conf['client_secret'], state['bearer'], force=True)
+
+	# Reload the configuration to keep the new tokens in memory
+	reload_config(state)
+
 '''
-======================================================
-	If the response status code is 401 (Unauthorized):
-	
-	*	Refresh the bearer token
-	
-	*	Load the updated configuration file
-	
-	*	Update the bearer token with the new value
-		from the updated config and make a new API
-		request with the updated bearer token
-======================================================
+===================================================
+	Define a function to refresh the bearer token
+	ahead of its expiration, so that the API
+	requests do not fail with a 401 response.
+
+	Nothing is done if the expiration time is not
+	known (e.g. config file created before it was
+	stored) or further than the refresh margin.
+
+	The refresh is single-flight: if several
+	processes run at the same time, only one of
+	them refreshes the tokens and the others pick
+	up the new bearer token from the config file
+===================================================
 '''
 
+def refresh_ahead(state):
+	conf = state['config']
+
+	if not conf['expires_at'] or conf['expires_at'] - time.time() > conf['refresh_margin']:
+		return
+
+	logging.info('Token about to expire: starting refresh process...')
+	from refresh import ensure_token
+	ensure_token(conf['config_file_path'], conf['endpoint'], conf['client_id'], conf['client_secret'], state['bearer'], conf['refresh_margin'])
+
+	# Reload the configuration to keep the new tokens in memory
+	reload_config(state)
+
 '''
-============================================
+===================================================
+	Define a function to make several independent
+	API requests concurrently.
+
+	*	Send the requests in parallel on a thread
+		pool bounded by the concurrency setting,
+		with the extra headers given for each URL
+		(and streamed if the stream flag is set)
+
+	*	If any response status code is 403 or 401,
+		recover the bearer token only once for all
+		the requests and send again the failed ones
+		with the updated bearer token
+
+	*	Record the rate limit headers of every
+		response in the quota and its status code
+		in the metrics
+
+	*	Log the time spent to get all responses
+
 	If the response status code is 200 (OK):
 
 	*	proceed with the code execution
-============================================
+===================================================
 '''
 
-try:
+def authorized_requests(state, urls, extra_headers=None, stream=False):
+	extra_headers = extra_headers or {}
+	start = time.perf_counter()
+	workers = max(1, min(len(urls), state['config']['concurrency']))
 
-	# Check for 403 error case
-	if unread_response.status_code == 403:
-		logging.info('Token not available: starting oauth process...')
-		run_app()
+	def fetch(url):
+		response = APIrequest(url, state['bearer'], state['session'], extra_headers.get(url), stream)
+		state['requests'] += 1
+		ratelimit.record(state['quota'], response)
+		metrics.record_response(response)
+		return response
 
-		with open(config_path) as config_file:
-			new_config = json.load(config_file)
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		with metrics.span('http'):
+			responses = list(executor.map(fetch, urls))
 
-		bearer = new_config['oauth']['bearer']
+		failed = [i for i, response in enumerate(responses) if response.status_code in (401, 403)]
 
-		unread_response = APIrequest(unread_counts_url, bearer)
+		if failed:
+			# A 403 means there is no usable token at all: it prevails over a 401
+			status_code = 403 if any(responses[i].status_code == 403 for i in failed) else 401
+			recover_token(state, status_code)
 
-	# Check for 401 error case
-	elif unread_response.status_code == 401:
-		logging.info('Token expired: starting refresh process...')
-		refresh(config_path, endpoint, client_id, client_secret, refresh_token)
+			with metrics.span('http'):
+				retried = list(executor.map(fetch, [urls[i] for i in failed]))
 
-		with open(config_path) as config_file:
-			new_config = json.load(config_file)
+			for i, response in zip(failed, retried):
+				# Release the connection of the failed response
+				responses[i].close()
+				responses[i] = response
 
-		bearer = new_config['oauth']['bearer']
-		
-		unread_response = APIrequest(unread_counts_url, bearer)
-
-	# Proceed with the code execution
-	elif unread_response.status_code == 200:
+	if all(response.status_code in (200, 304) for response in responses):
 		logging.info('API request ok: retrieving data...')
-		pass
-
-except Exception as e:
-	logging.debug(e)
 
-# Make API request to get feeds list
+	logging.info(f'Fetched {len(urls)} endpoint(s) in {time.perf_counter() - start:.3f} seconds')
 
-try:
-	feeds_list_response = APIrequest(feeds_list_url, bearer)
+	return responses
 
-except Exception as e:
-	logging.debug(e)
+def authorized_request(state, url, extra_headers=None, stream=False):
+	return authorized_requests(state, [url], {url: extra_headers}, stream)[0]
 
 '''
-=======================================
-	Parse the responses data as JSON
-	
-	Iterate over the unread counts and
-	subscriptions and store them in the
-	respective dictionaries
-
-	If the subscription has categories
-	(is part of a folder) append the
-	category in the categories list
-=======================================
+==================================================
+	Define functions to update the feed registry
+	from the feeds list.
+
+	The feeds list is requested with the cache
+	validators (ETag / Last-Modified). If the
+	response status code is 304 (Not Modified),
+	keep the cached subscriptions. If it is another
+	error (e.g. 429 Too Many Requests), keep the
+	current subscriptions. Otherwise parse the
+	feeds list and save it in the cache.
+
+	Each subscription is added to a new registry
+	with its category (folder) if it has one. The
+	feeds list is parsed from the response bytes,
+	as a stream if possible
+==================================================
 '''
 
-feeds_list_data = getData(feeds_list_response)
-unread_data = getData(unread_response)
+def update_subscriptions(state, feeds_list_response=None):
+	if feeds_list_response is None:
+		headers = cache.conditional_headers(state['feeds_cache'])
+		feeds_list_response = authorized_request(state, state['config']['feeds_list_url'], headers, parsing.streaming)
 
-for unread in unread_data['unreadcounts']:
-	unread['count'] = int(unread['count'])
-	if unread['count'] > 0:
-		unreadcounts[unread['id']] = unread['count']
+	if feeds_list_response.status_code == 304 and state['feeds_cache'] is not None:
+		logging.info('Feeds list not modified: using cached subscriptions...')
+		cache.touch_entry(cache_name(state, 'feeds'), state['feeds_cache'])
 
-for subscribed in feeds_list_data['subscriptions']:
-	if subscribed['categories']:
-		if subscribed['categories'][0]['id'] not in categories:
-			categories.append(subscribed['categories'][0]['id'])
-	
-	subscriptions[subscribed['id']] = subscribed['title']
+	elif feeds_list_response.status_code != 200:
+		logging.info(f'Feeds list not available (status code {feeds_list_response.status_code}): keeping current subscriptions...')
+
+	else:
+		parse_subscriptions(state, feeds_list_response)
+		state['feeds_cache'] = cache.save_entry(cache_name(state, 'feeds'), feeds_list_response, state['registry'].to_data())
+
+def parse_subscriptions(state, feeds_list_response):
+	registry = FeedRegistry()
+
+	with metrics.span('feeds_parse'):
+		for feed_id, title, folder_ids in parsing.response_subscriptions(feeds_list_response):
+			registry.add_feed(feed_id, title, folder_ids)
+
+	state['registry'] = registry
 
 '''
 ==================================================
-	Iterate over the unreadcounts dictionary
-	
-	Determine the appropriate singular or
-	plural notification label based on the
-	count (e.g. new article or new articles)
+	Define a function to get the notification
+	entries (count, title and priority) of an
+	account from the selected unread feeds
 
-	Include the unread feed in the notification
-	only if it is not in the categories list.
-	This is to avoid duplicates notifications
-	for the unread feed and the folder in which
-	the feed is.
+	Aggregate the unread counts with the
+	registry in a single pass: the folders are
+	not included as such, to avoid duplicates
+	notifications for the unread feed and the
+	folders in which the feed is.
 
 	Do not include the reading-list in the
 	notification
-	
-	If the unread_id exists in the subscriptions
-	dictionary, get the title associated with it.
-	Else extract the title from the unread_id.
 
-	Finally append the count, new_articles label
-	and title to the message string
+	If the notification is grouped by folder,
+	get one entry per folder with the total of
+	its feeds (a feed in several folders counts
+	in each of them) and the highest priority
+	of its feeds, and one entry per feed without
+	folder. Otherwise get one entry per feed.
+
+	Get the title of the unread_id from the
+	registry (the registry extracts it from the
+	unread_id for an unknown feed). When several
+	accounts are polled, prefix the title with
+	the account name.
+
+	If headlines are given for the unread_id,
+	list them below the title.
 ==================================================
 '''
 
-for unread_id, count in unreadcounts.items():
+def unread_entries(state, selected, previews=None):
+	registry = state['registry']
+	prefix = '[{}] '.format(state['name']) if state['name'] is not None else ''
+	previews = previews or {}
 
-	# Determine singular or plural notification label
-	new_articles = singular_article if count == 1 else plural_articles
-	count = str(count)
+	feeds, folders, unfiled = registry.aggregate({unread_id: count for unread_id, (count, priority) in selected.items() if unread_id.split("/")[-1] != "reading-list"})
+
+	if state['config']['group_by_folder']:
+		entries = [
+			(total, prefix + registry.title(folder_id), max(selected[feed_id][1] for feed_id in feed_ids))
+			for folder_id, (total, feed_ids) in folders.items()
+		]
+
+		feed_ids = unfiled
+
+	else:
+		entries = []
+		feed_ids = feeds
+
+	entries.extend(
+		(feeds[unread_id], prefix + registry.title(unread_id) + ''.join('\n  • ' + title for title in previews.get(unread_id, ())), selected[unread_id][1])
+		for unread_id in feed_ids
+	)
+
+	return entries
+
+'''
+==================================================
+	Define a function to get the newest headlines
+	of the feeds with new unread articles
+
+	*	Only the feeds which will be listed in the
+		notification are previewed (the ones with
+		the highest priorities, then the highest
+		counts), each with a budget of
+		at most the headlines setting and its
+		number of new articles
+
+	*	List the ids of the newest unread items of
+		all the feeds concurrently. Each round
+		requests the next page (continuation token)
+		of the feeds whose budget is not filled
+		yet, so that the pagination stops as soon
+		as a feed has enough items
+
+	*	Get the titles of the items which are not
+		in the headline cache, in batches, and add
+		them to the cache. Save the cache if it
+		changed
+
+	*	Return the headlines of each feed, newest
+		first
+==================================================
+'''
+
+def fetch_headlines(state, selected):
+	conf = state['config']
+	cached = state['headlines']
+
+	feeds = [(unread_id, count, priority) for unread_id, (count, priority) in selected.items() if unread_id.startswith('feed/')]
+	budgets = {unread_id: min(count, conf['headlines']) for unread_id, count, priority in heapq.nlargest(conf['max_lines'], feeds, key=itemgetter(2, 1))}
+
+	item_ids = {feed_id: [] for feed_id in budgets}
+	pending = {feed_id: None for feed_id in budgets}
+
+	while pending:
+		feed_ids = list(pending)
+		urls = [headlines.ids_url(conf['unread_counts_url'], feed_id, budgets[feed_id] - len(item_ids[feed_id]), pending[feed_id]) for feed_id in feed_ids]
+		pending = {}
+
+		for feed_id, response in zip(feed_ids, authorized_requests(state, urls)):
+			if response.status_code != 200:
+				continue
+
+			data = getData(response)
+			item_ids[feed_id].extend(item['id'] for item in data.get('itemRefs') or [])
+			del item_ids[feed_id][budgets[feed_id]:]
+
+			if len(item_ids[feed_id]) < budgets[feed_id] and data.get('continuation'):
+				pending[feed_id] = data['continuation']
+
+	missing = [item_id for ids in item_ids.values() for item_id in ids if item_id not in cached]
+
+	if missing:
+		for response in authorized_requests(state, headlines.contents_urls(conf['unread_counts_url'], missing)):
+			if response.status_code == 200:
+				for item in getData(response).get('items') or []:
+					cached.put(headlines.short_id(item['id']), item.get('title') or '')
+
+	if cached.changed:
+		cache.write_entry(cache_name(state, 'headlines'), cached.to_data())
+		cached.changed = False
+
+	previews = {}
+
+	for feed_id, ids in item_ids.items():
+		titles = [cached.get(item_id) for item_id in ids]
+		previews[feed_id] = [title for title in titles if title]
+
+	return previews
+
+'''
+==================================================
+	Define a function to build the notification
+	message from the entries, bounded by the
+	line and size budgets of the config, and send
+	the notification only if the message body is
+	set.
+
+	Return False if the notification could not be
+	sent
+==================================================
+'''
+
+def notify(conf, entries):
+	metrics.count('notified_feeds', len(entries))
+
+	with metrics.span('message'):
+		body = message.build(entries, conf['singular_article'], conf['plural_articles'], conf['more_feeds'], conf['max_lines'], conf['max_chars'])
+
+	try:
+		if body != "":
+			import notif
+			notif.send_notification(conf['summary'], body)
+			logging.info('Notification successfully sent!')
 
-	# Do not include the categories and the reading-list in the notification
-	if not unread_id in categories:
-		if unread_id.split("/")[-1] == "reading-list":
-			pass
-		
 		else:
-		
-			# Get the clean feed title
-			if unread_id in (k for k,v in subscriptions.items()):
-				title = next(v for k, v in subscriptions.items() if k == unread_id)
-			
-			else:
-				title = unread_id.split("/")[-1]
-		
-			# Build the final notification message
-			message = message + count + " " + new_articles + " " + title + "\n"
+			logging.info('No new unread articles. Notification not sent.')
+			pass
+
+	except Exception as e:
+		logging.debug(e)
+		return False
+
+	return True
+
+'''
+==================================================
+	Define a function to save the unread snapshot
+	of the last check once its notification is
+	sent, so that the feeds of a failed
+	notification are notified again by the next
+	poll
+==================================================
+'''
+
+def commit_snapshot(state):
+	snapshot = state['pending_snapshot']
+	state['pending_snapshot'] = None
+
+	if snapshot is not None and snapshot != state['unread_snapshot']:
+		cache.write_entry(cache_name(state, 'unread'), snapshot)
+		state['unread_snapshot'] = snapshot
+
+'''
+==================================================
+	Define a function to compute the unread delta
+	between the previous snapshot and the current
+	one.
+
+	Both snapshots map each unread id to a list of
+	its count and newestItemTimestampUsec value.
+
+	A feed has new items if its newest item is
+	more recent than in the previous snapshot (or,
+	without timestamp, if its count increased).
+	The number of new items is the count increase,
+	at least 1 since the newest item changed (some
+	articles may have been read in the meantime)
+==================================================
+'''
+
+def unread_delta(previous, snapshot):
+	delta = {}
+
+	for unread_id, (count, newest) in snapshot.items():
+		previous_count, previous_newest = previous.get(unread_id, (0, 0))
+
+		if newest > previous_newest or (not newest and count > previous_count):
+			delta[unread_id] = min(count, max(1, count - previous_count))
+
+	return delta
+
+'''
+==================================================
+	Define a function checking the unread
+	articles of an account
+
+	*	Get the configuration from the config store
+		(only reloaded if the config file changed,
+		e.g. tokens refreshed by another process)
+
+	*	Skip the check while the API rate limits
+		are reached (nothing is requested)
+
+	*	Refresh the bearer token if it is about
+		to expire
+
+	*	Make API request to get unread counts and
+		store them in the unreadcounts dictionary.
+		Unless the cached subscriptions are still
+		fresh, get (or revalidate) the feeds list
+		at the same time
+
+	*	If the unread counts request is rejected
+		by the rate limits (429) or failed (e.g.
+		server error after the retries), skip the
+		check
+
+	*	Make API request to get feeds list again
+		if an unread feed is missing from the
+		subscriptions (e.g. new subscription
+		since the last cycle), unless the feeds
+		list was requested with the unread counts
+		or the feed was already missing from it
+		at the previous cycle
+
+	*	Record the number of new items since the
+		previous cycle in the activity history
+		(even if the notification of the previous
+		cycle failed, its snapshot is the baseline).
+		If incremental notifications are enabled,
+		only keep the feeds with new items since
+		the previous cycle. Keep the new unread
+		snapshot pending until the notification
+		is sent
+
+	*	Select the feeds to notify with the filter
+		rules of the config
+
+	*	If the headlines setting is set (and the
+		notification is not grouped by folder),
+		get the newest headlines of the feeds to
+		notify (if they cannot be fetched, the
+		feeds are notified without them)
+
+	*	Return the notification entries
+==================================================
+'''
+
+def check(state):
+	state['pending_snapshot'] = None
+
+	with metrics.span('config'):
+		reload_config(state)
+		update_filters(state)
+
+	state['requests'] = 0
+
+	if ratelimit.is_blocked(state['quota']):
+		logging.info('API rate limit reached: skipping this poll...')
+		return []
+
+	refresh_ahead(state)
+
+	unreadcounts = {}
+	snapshot = {}
+	conf = state['config']
+
+	listed = not cache.is_fresh(state['feeds_cache'], conf['cache_ttl'])
+
+	if not listed:
+		unread_response = authorized_request(state, conf['unread_counts_url'])
+
 	else:
-		pass
+		headers = {conf['feeds_list_url']: cache.conditional_headers(state['feeds_cache'])}
+		unread_response, feeds_list_response = authorized_requests(state, [conf['unread_counts_url'], conf['feeds_list_url']], headers, parsing.streaming)
+		update_subscriptions(state, feeds_list_response)
+
+	cache.write_entry(cache_name(state, 'ratelimit'), state['quota'])
+
+	if unread_response.status_code == 429:
+		logging.info('API rate limit reached (429): skipping this poll...')
+		return []
+
+	if unread_response.status_code != 200:
+		logging.info(f'Unread counts not available (status code {unread_response.status_code}): skipping this poll...')
+		return []
+
+	with metrics.span('unread_parse'):
+		unread_data = getData(unread_response)
+
+		for unread in unread_data['unreadcounts']:
+			unread['count'] = int(unread['count'])
+			if unread['count'] > 0:
+				unreadcounts[unread['id']] = unread['count']
+				snapshot[unread['id']] = [unread['count'], int(unread.get('newestItemTimestampUsec', 0))]
+
+	registry = state['registry']
+	unknown = [unread_id for unread_id in unreadcounts if unread_id.startswith('feed/') and unread_id not in registry]
+
+	# Get the feeds list once per unknown feed, unless it was already requested by this poll
+	if unknown and not listed and not set(unknown) <= set(state['unknown_feeds']):
+		update_subscriptions(state)
+
+	if unknown != state['unknown_feeds']:
+		state['unknown_feeds'] = unknown
+		cache.write_entry(cache_name(state, 'unknown'), unknown)
+
+	metrics.count('feeds', len(state['registry']))
+	metrics.count('unread_feeds', len(unreadcounts))
+
+	with metrics.span('delta'):
+		delta = unread_delta(state['unread_snapshot'], snapshot)
+
+		# Only count the items new since the previous cycle, even if its notification failed
+		baseline = state['activity'].get('unread')
+		new_items = delta if baseline is None or baseline == state['unread_snapshot'] else unread_delta(baseline, snapshot)
+
+		activity.record(state['activity'], sum(count for unread_id, count in new_items.items() if unread_id.startswith('feed/')))
+		state['activity']['unread'] = snapshot
+		cache.write_entry(cache_name(state, 'activity'), state['activity'])
+
+		if conf['incremental']:
+			unreadcounts = delta
+
+		state['pending_snapshot'] = snapshot
+
+	with metrics.span('filters'):
+		selected = state['filters'].select(state['registry'], unreadcounts)
+
+	previews = None
+
+	if conf['headlines'] and selected and not conf['group_by_folder']:
+		with metrics.span('headlines'):
+			try:
+				previews = fetch_headlines(state, selected)
+
+			except Exception as e:
+				# The headlines are optional: notify the counts without them
+				logging.debug(f'Headlines not available: {e}')
+
+	return unread_entries(state, selected, previews)
+
+'''
+==================================================
+	Define a function running one polling cycle
+	of a single account within the run deadline,
+	publishing its unread status and writing its
+	metrics record
+==================================================
+'''
+
+def poll(state):
+	metrics.start()
+	transport.start_deadline(state['config']['deadline'])
+
+	try:
+		entries = check(state)
+		status.publish([state])
+
+		if notify(state['config'], entries):
+			commit_snapshot(state)
+
+	finally:
+		metrics.finish(state['config']['metrics_file'])
+
+'''
+==================================================
+	Define a function running one polling cycle
+	of several accounts
+
+	*	Check the accounts concurrently on a thread
+		pool bounded by the number of workers. A
+		failing account is logged and does not
+		prevent the others from being notified
+
+	*	Publish the unread status of all accounts
+
+	*	Merge the entries of all accounts and send
+		a single notification (with the settings
+		of the first account). Save the unread
+		snapshots once it is sent
+
+	*	Write a single metrics record for all the
+		accounts (the durations of each phase are
+		added up)
+
+	All the requests of the cycle share the run
+	deadline
+==================================================
+'''
+
+def poll_accounts(states, workers):
+	start = time.perf_counter()
+	metrics.start()
+	transport.start_deadline(states[0]['config']['deadline'])
+
+	def safe_check(state):
+		try:
+			return check(state)
+
+		except Exception as e:
+			logging.debug(f'Account {state["name"]}: {e}')
+			return []
+
+	with ThreadPoolExecutor(max_workers=max(1, min(len(states), workers))) as executor:
+		entries = [entry for account_entries in executor.map(safe_check, states) for entry in account_entries]
+
+	logging.info(f'Checked {len(states)} accounts in {time.perf_counter() - start:.3f} seconds')
+
+	try:
+		status.publish(states)
+
+		if notify(states[0]['config'], entries):
+			for state in states:
+				commit_snapshot(state)
+
+	finally:
+		metrics.finish(states[0]['config']['metrics_file'])
 
 '''
-====================================
-	Send the notification for unread
-	feeds only if the message string
-	is set
-====================================
+=============================================
+	Parse the command line arguments and run
+	Inopy, profiled with the --profile option.
+
+	Load the state of the default account or,
+	if an accounts file exists, of each of the
+	accounts. The shared HTTP connection pool
+	is then sized for all the workers.
+
+	Run a single polling cycle or, with the
+	--daemon option, keep polling with the
+	built-in scheduler. The polling interval
+	is read from the config file unless it
+	is given on the command line. If the
+	adaptive setting is enabled (and no
+	interval is given), it is learnt from the
+	activity of the feeds of the busiest
+	account instead. In both cases it is
+	lengthened to fit the API rate limits.
+	The unread status is served on a Unix
+	socket while the daemon runs, and the
+	HTTP connections are closed when it stops.
+=============================================
 '''
 
-try:
-	if message != "":
-		notif.send_notification(summary, message)
-		logging.info('Notification successfully sent!')
+def main():
+	import argparse
+
+	parser = argparse.ArgumentParser(description='Send a notification for unread Inoreader articles.')
+	parser.add_argument('--daemon', action='store_true', help='keep running and poll at a regular interval')
+	parser.add_argument('--interval', type=int, help='polling interval in seconds (daemon mode)')
+	parser.add_argument('--profile', nargs='?', const='all', choices=('cpu', 'memory', 'all'), help='profile the run with cProfile and/or tracemalloc (default: all) and write the reports to ~/.inopy/profiles/')
+	parser.add_argument('--flamegraph', action='store_true', help='with --profile, also write the sampled stacks in the collapsed flamegraph format')
+	args = parser.parse_args()
+
+	if args.profile:
+		import profiling
+
+		with profiling.profile(args.profile, args.flamegraph):
+			run(args)
 
 	else:
-		logging.info('No unread articles. Notification not sent.')
-		pass
+		run(args)
+
+def run(args):
+	multiple = accounts()
+
+	if multiple is None:
+		states = [load_state()]
+		job = lambda: poll(states[0])
+
+	else:
+		account_list, workers = multiple
+		conf = config(account_list[0][1])
+		transport.get_session(max(conf['pool_size'], workers * conf['concurrency']))
+
+		states = [load_state(path, name) for name, path in account_list]
+		job = lambda: poll_accounts(states, workers)
+
+	# Apply the logging settings of the (first) config file
+	conf = states[0]['config']
+	logs.configure(conf['log_level'], conf['log_max_bytes'], conf['log_backup_count'], conf['log_when'], conf['log_compress'])
+
+	if args.daemon:
+		interval = args.interval or states[0]['config']['interval']
+		logging.info(f'Running in daemon mode, polling every {interval} seconds...')
+
+		# Reload the config only on inotify events in daemon mode
+		for state in states:
+			get_store(state['config']['config_file_path']).watch()
+
+		# Poll more often when the feeds are busy, less often when they are quiet
+		def base_interval():
+			if args.interval or not states[0]['config']['adaptive']:
+				return interval
+
+			return min(activity.next_interval(state['activity'], interval, state['config']['min_interval'], state['config']['max_interval']) for state in states)
+
+		# Spread the polls over the remaining API rate limits
+		def next_interval():
+			base = base_interval()
+			return max(ratelimit.next_interval(state['quota'], base, state['requests'], state['config']['quota_threshold']) for state in states)
+
+		# Serve the unread status to the local readers
+		status.serve(states[0]['config']['status_socket'])
+
+		import scheduler
+
+		try:
+			scheduler.run(job, next_interval)
+
+		finally:
+			status.stop()
+			transport.close_session()
+
+	else:
+		try:
+			job()
+
+		except Exception as e:
+			logging.debug(e)
 
-except Exception as e:
-	logging.debug(e)
\ No newline at end of file
+if __name__ == '__main__':
+	main()
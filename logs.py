@@ -21,15 +21,165 @@
 
     This module aims to log the program processes.
 
+    The log records are put in a queue by the program and written to the log file by a background thread, so that logging never blocks on file I/O. The log file is rotated by size and/or by time (daily or hourly), the old files are compressed and a lock file makes the writes and rotations safe when several processes log to the same file.
+
 =========================================================================================
 """
 
 import os
+import gzip
+import time
+import queue
+import fcntl
+import atexit
+import shutil
 import logging
+import logging.handlers
+
+# Default logging settings (see the logging section of the config file)
+DEFAULTS = {
+    'level': 'DEBUG',
+    'max_bytes': 1048576,
+    'backup_count': 5,
+    'when': '',
+    'compress': True
+}
+
+# Time formats of the rotation periods
+PERIODS = {
+    'hourly': '%Y%m%d%H',
+    'daily': '%Y%m%d'
+}
+
+# Background listener writing the queued records (None until LogFile is called)
+listener = None
+
+'''
+=================================================================
+    Create a handler writing the records to the log file and
+    rotating it
+
+    *   Every write is made under an exclusive lock on a lock
+        file, so that the records of several processes do not
+        interleave and only one of them rotates the file
+
+    *   If another process rotated the file, reopen it before
+        writing
+
+    *   Rotate the file if it is larger than max_bytes, or if it
+        was last written in an earlier period (hour or day) than
+        the current one
+
+    *   On rotation, shift the backups (inopy.log.1.gz becomes
+        inopy.log.2.gz...), keep at most backup_count of them
+        and compress the rotated file
+=================================================================
+'''
+
+class RotatingLogHandler(logging.FileHandler):
+
+    def __init__(self, filename, max_bytes=0, backup_count=5, when='', compress=True):
+        super().__init__(filename, mode='a', encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.period = PERIODS.get(when)
+        self.compress = compress
+        self.lock_path = filename + '.lock'
+
+    def backup_name(self, index):
+        return '{}.{}{}'.format(self.baseFilename, index, '.gz' if self.compress else '')
+
+    def reopen_if_rotated(self):
+        if self.stream is None:
+            return
+
+        try:
+            rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+
+        except FileNotFoundError:
+            rotated = True
+
+        if rotated:
+            self.stream.close()
+            self.stream = None
+
+    def should_rotate(self):
+        try:
+            stat = os.stat(self.baseFilename)
+
+        except FileNotFoundError:
+            return False
+
+        if self.max_bytes and stat.st_size >= self.max_bytes:
+            return True
+
+        if self.period and stat.st_size:
+            return time.strftime(self.period, time.localtime(stat.st_mtime)) != time.strftime(self.period)
+
+        return False
+
+    def rotate(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+        if self.backup_count <= 0:
+            os.remove(self.baseFilename)
+            return
+
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self.backup_name(index)):
+                os.replace(self.backup_name(index), self.backup_name(index + 1))
+
+        if self.compress:
+            with open(self.baseFilename, 'rb') as source, gzip.open(self.backup_name(1), 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+            os.remove(self.baseFilename)
+
+        else:
+            os.replace(self.baseFilename, self.backup_name(1))
+
+    def emit(self, record):
+        try:
+            with open(self.lock_path, 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+                try:
+                    self.reopen_if_rotated()
+
+                    if self.should_rotate():
+                        self.rotate()
+
+                    super().emit(record)
+                    self.flush()
+
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        except Exception:
+            self.handleError(record)
+
+'''
+=================================================================
+    Create a function to build the file handler from the
+    logging settings
+=================================================================
+'''
+
+def file_handler(log_file, settings):
+    handler = RotatingLogHandler(log_file, int(settings['max_bytes']), int(settings['backup_count']), settings['when'], settings['compress'])
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(process)d - %(levelname)s - %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p'))
+    return handler
 
 # Setting the logs file
 def LogFile():
-    
+    global listener
+
+    # The logging pipeline is only set up once per process
+    if listener is not None:
+        return
+
     # Determine the user's home directory
     logs_dir = os.path.join(os.environ['HOME'], '.inopy/logs')
     os.makedirs(logs_dir, exist_ok=True)
@@ -37,5 +187,51 @@ def LogFile():
     # Configure logging
     log_file = os.path.join(logs_dir, "inopy.log")
 
-    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', 
-datefmt='%m/%d/%Y %I:%M:%S %p', filename=log_file, level=logging.DEBUG)
\ No newline at end of file
+    # The records are queued by the program and written by the listener thread
+    log_queue = queue.SimpleQueue()
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(DEFAULTS['level'])
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler(log_file, DEFAULTS))
+    listener.start()
+
+    # Write the remaining records before the program exits
+    atexit.register(stop)
+
+# Stop the listener once the queued records are written
+def stop():
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+'''
+=================================================================
+    Create a function to apply the logging settings of the
+    config file (level, rotation and compression) once it is
+    loaded: the listener is restarted with a new file handler
+=================================================================
+'''
+
+def configure(level, max_bytes, backup_count, when, compress):
+    if listener is None:
+        LogFile()
+
+    settings = {
+        'level': level.upper(),
+        'max_bytes': max_bytes,
+        'backup_count': backup_count,
+        'when': when,
+        'compress': compress
+    }
+
+    logging.getLogger().setLevel(settings['level'])
+
+    stop()
+
+    for handler in listener.handlers:
+        handler.close()
+
+    log_file = listener.handlers[0].baseFilename
+    listener.handlers = (file_handler(log_file, settings),)
+    listener.start()
@@ -0,0 +1,74 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module builds the body of the notification from the unread feeds.
+
+	The body is bounded by a number of lines and a number of characters: only the feeds with the most unread articles are listed, selected with a heap instead of sorting all of them, and the remaining feeds are summarized in a single line.
+
+=========================================================================================
+"""
+
+import heapq
+from operator import itemgetter
+
+'''
+====================================================
+	Define a function to build the notification
+	body from (count, title, priority) entries
+
+	*	Select the max_lines entries with the
+		highest priorities, then the highest
+		counts, with a heap (O(n log k))
+
+	*	Build each line with the appropriate
+		singular or plural label and stop before
+		the body exceeds max_chars (keeping at
+		least one line)
+
+	*	Count the feeds and articles which are not
+		listed and summarize them with the
+		more_feeds label
+
+	*	Join the lines once at the end instead of
+		concatenating strings in the loop
+====================================================
+'''
+
+def build(entries, singular_article, plural_articles, more_feeds, max_lines=10, max_chars=1000):
+	entries = list(entries)
+	top = heapq.nlargest(max_lines, entries, key=itemgetter(2, 0))
+
+	lines = []
+	size = 0
+	listed_articles = 0
+
+	for count, title, priority in top:
+		new_articles = singular_article if count == 1 else plural_articles
+		line = '{} {} {}'.format(count, new_articles, title)
+
+		if lines and size + len(line) + 1 > max_chars:
+			break
+
+		lines.append(line)
+		size += len(line) + 1
+		listed_articles += count
+
+	more = len(entries) - len(lines)
+
+	if more:
+		articles = sum(entry[0] for entry in entries) - listed_articles
+		lines.append(more_feeds.format(feeds=more, articles=articles))
+
+	return '\n'.join(lines) + '\n' if lines else ''
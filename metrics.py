@@ -0,0 +1,157 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module measures the duration of each phase of a polling cycle (config loading, HTTP requests, token refresh, JSON parsing, message building, D-Bus notification...).
+
+	The phases are measured with lightweight timing spans. At the end of each cycle, one structured record (a JSON line) with the durations, the HTTP status codes, the bytes received and the feed counts is written to the log and, optionally, appended to a metrics file that other tools can read.
+
+=========================================================================================
+"""
+
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# Record of the current polling cycle (None outside of a cycle)
+run = None
+lock = threading.Lock()
+
+'''
+================================================
+	Define a function to start the record of a
+	new polling cycle
+================================================
+'''
+
+def start():
+	global run
+
+	run = {
+		'start': time.time(),
+		'clock': time.perf_counter(),
+		'durations': {},
+		'status_codes': [],
+		'raw_responses': [],
+		'counts': {}
+	}
+
+'''
+================================================
+	Define a context manager measuring the
+	duration of a phase. The durations of a
+	phase run several times (e.g. by several
+	accounts) are added up
+================================================
+'''
+
+@contextmanager
+def span(name):
+	phase_start = time.perf_counter()
+
+	try:
+		yield
+
+	finally:
+		current = run
+
+		if current is not None:
+			with lock:
+				durations = current['durations']
+				durations[name] = durations.get(name, 0) + time.perf_counter() - phase_start
+
+'''
+================================================
+	Define functions to record the status code
+	of a response (and its raw stream, to count
+	the bytes received at the end of the cycle,
+	once the body has been read) and to add up
+	counts (e.g. number of feeds)
+================================================
+'''
+
+def record_response(response):
+	current = run
+
+	if current is not None:
+		with lock:
+			current['status_codes'].append(response.status_code)
+			current['raw_responses'].append(response.raw)
+
+def count(name, value):
+	current = run
+
+	if current is not None:
+		with lock:
+			current['counts'][name] = current['counts'].get(name, 0) + value
+
+'''
+================================================
+	Define a function to finish the record of
+	the current polling cycle
+
+	*	Build the record with the wall time,
+		the durations rounded to the microsecond,
+		the status codes, the bytes received and
+		the counts
+
+	*	Write the record as a JSON line to the
+		log and append it to the metrics file if
+		one is set
+================================================
+'''
+
+def finish(metrics_file=''):
+	global run
+
+	current = run
+	run = None
+
+	if current is None:
+		return None
+
+	received = 0
+
+	for raw in current['raw_responses']:
+		try:
+			received += raw.tell()
+
+		except Exception:
+			pass
+
+	record = {
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(current['start'])),
+		'wall': round(time.perf_counter() - current['clock'], 6),
+		'durations': {name: round(duration, 6) for name, duration in current['durations'].items()},
+		'status_codes': current['status_codes'],
+		'requests': len(current['status_codes']),
+		'bytes_received': received
+	}
+
+	record.update(current['counts'])
+	line = json.dumps(record)
+
+	logging.info(f'Metrics: {line}')
+
+	if metrics_file:
+		try:
+			with open(metrics_file, 'a') as file:
+				file.write(line + '\n')
+
+		except Exception as e:
+			logging.debug(e)
+
+	return record
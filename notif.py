@@ -25,7 +25,56 @@
 """
 
 import os
-from pydbus import SessionBus
+import logging
+import metrics
+
+# Notifications proxy object kept between two notifications
+notifications = None
+
+# ID of the last notification sent, replaced by the next one (0 means none yet)
+notification_id = 0
+
+'''
+=========================================
+	Define a function to get the
+	.Notifications interface object
+
+	*	Import pydbus, create a new session
+		bus instance and get the
+		.Notifications object from the bus
+		only the first time
+
+	*	Reuse the same object afterwards
+		(e.g. in daemon mode)
+=========================================
+'''
+
+def get_notifications():
+	global notifications
+
+	if notifications is None:
+		from pydbus import SessionBus
+
+		bus = SessionBus()
+		notifications = bus.get('.Notifications')
+
+	return notifications
+
+'''
+=========================================
+	Define a function to drop the cached
+	.Notifications object (e.g. after the
+	session bus or the notification server
+	was restarted), so that the next call
+	reconnects
+=========================================
+'''
+
+def reset_notifications():
+	global notifications, notification_id
+
+	notifications = None
+	notification_id = 0
 
 '''
 =========================================
@@ -33,17 +82,33 @@ from pydbus import SessionBus
 	notification when a new unread
 	article is present in the feed
 
-	*	Create a new session
-		bus instance
-	
 	*	Get the .Notifications interface
-		object from the bus
+		object
+
+	*	Replace the previous notification
+		(if any) instead of stacking a new
+		one and keep the returned ID for the
+		next notification
+
+	*	If the call fails, reconnect to the
+		session bus and try once again
 =========================================
 '''
 
 def send_notification(summary, body):
-	bus = SessionBus()
-	notifications = bus.get('.Notifications')
+	try:
+		notify(summary, body)
+
+	except Exception as e:
+		logging.debug(f'Notification failed: reconnecting to the session bus... ({e})')
+		reset_notifications()
+		notify(summary, body)
+
+def notify(summary, body):
+	global notification_id
+
+	with metrics.span('dbus_connect'):
+		notifications = get_notifications()
 
 	'''
 	==================================================================================
@@ -51,7 +116,8 @@ def send_notification(summary, body):
 		Parameters:
 
 			* 'MyApp': The name of the application sending the notification
-			* 0: The ID of the notification (0 means a new notification)
+			* notification_id: The ID of the notification to replace (0 means a new
+			  notification)
 			* '': An optional icon name or path for the notification
 			* summary: The summary text of the notification
 			* body: The body text of the notification
@@ -63,4 +129,6 @@ def send_notification(summary, body):
 	==================================================================================
 	'''
 	icon = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icons/inoreader.png')
-	notifications.Notify('Inopy', 0, icon, summary, body, [], {}, 5000)
\ No newline at end of file
+
+	with metrics.span('dbus'):
+		notification_id = notifications.Notify('Inopy', notification_id, icon, summary, body, [], {}, 5000)
@@ -28,22 +28,28 @@
 =========================================================================================
 """
 
-import requests
+import os
 import webbrowser
 import time
-import json
 import subprocess
 import threading
+import configparser
 import logging
-from flask import Flask, request, redirect, render_template
-from config import config
-from waitress import serve
+import transport
+from flask import Flask, request, redirect, render_template, make_response
+from config import config, get_store
+from waitress import create_server as create_waitress_server
+from waitress.wasyncore import close_all
+from werkzeug.serving import make_server
 from logs import LogFile
 
 # Set logs file
 log_file = LogFile()
 
-def run_app():
+# Name of the browser profile used for the authentication (production mode)
+PROFILE_NAME = 'new_profile'
+
+def run_app(config_file_path=None):
 
 	'''
 	===================================
@@ -56,7 +62,7 @@ def run_app():
 	===================================
 	'''
 
-	conf = config()
+	conf = config(config_file_path)
 
 	endpoint = conf['endpoint']
 	client_id = conf['client_id']
@@ -69,6 +75,7 @@ def run_app():
 	browser_path = conf['browser_path']
 	host = conf['host']
 	port = conf['port']
+	timeout = conf['oauth_timeout']
 	config_file_path = conf['config_file_path']
 
 	url = 'https://www.inoreader.com/oauth2/auth?client_id={}&redirect_uri={}&response_type=code&scope={}&state={}'.format(client_id, callback, scope, CSRF)
@@ -81,6 +88,18 @@ def run_app():
 
 	app = Flask(__name__)
 
+	'''
+	==========================================
+		Create the events signaling that the
+		server is ready, that the tokens are
+		saved and that the server can stop
+	==========================================
+	'''
+
+	ready = threading.Event()
+	saved = threading.Event()
+	done = threading.Event()
+
 	'''
 	==================================
 		When the home url is accessed:
@@ -115,6 +134,9 @@ def run_app():
 		*	Save the bearer token and refresh token
 			to the config file
 		
+		*	Stop the server once the response is
+			sent
+		
 		*	If process is successfull:
 			
 			*	render the success template with the
@@ -153,28 +175,38 @@ def run_app():
 					'redirect_uri': callback
 				}
 
-				# Request bearer token and refresh token
-				response = requests.post(access_token_url, data=payload)
+				# Request bearer token and refresh token using the shared HTTP session
+				response = transport.get_session().post(access_token_url, data=payload)
 				
 				if response.status_code == 200:
 			
 					access_token = response.json()['access_token']
 					refresh_token = response.json()['refresh_token']
+					expires_in = response.json().get('expires_in')
+
+					# Save the bearer token and refresh token to the config file
+					get_store(config_file_path).update({
+						'oauth': {
+							'bearer': access_token,
+							'refresh_token': refresh_token,
+							'expires_at': int(time.time()) + int(expires_in) if expires_in else 0
+						}
+					})
 
-					with open(config_file_path, 'r+') as config_file:
-						config = json.load(config_file)
-						
-						# Save the bearer token and refresh token to the config file
-						config['oauth']['bearer'] = access_token
-						config['oauth']['refresh_token'] = refresh_token
-						
-						config_file.seek(0)
-						
-						json.dump(config, config_file, indent=4)
-						config_file.truncate()
+					saved.set()
+
+				else:
+					logging.warning(f'Token request failed with status code: {response.status_code}')
+					response = make_response(render_template('oauth-error.html', response=(response.status_code, response.text)))
+					response.call_on_close(done.set)
+					return response
 
 				logging.info('New token obtained successfully...')
-				return render_template('success.html', response=(access_token, refresh_token))
+
+				# Stop the server once the success page is sent
+				response = make_response(render_template('success.html', response=(access_token, refresh_token)))
+				response.call_on_close(done.set)
+				return response
 			
 			else:
 				if not csrf:
@@ -196,94 +228,148 @@ def run_app():
 	======================================
 		When the shutdown url is accessed:
 
-		*	Shut down the Flask server
-			gracefully
+		*	Stop the server once the response
+			is sent
 	======================================
 	'''
 
 	try:
 		@app.route('/shutdown')
 		def shutdown():
-			request.environ.get('werkzeug.server.shutdown')
-			logging.info('Shutting down Flask server...')
-			return 'Close this browser to terminate the process!'
+			logging.info('Shutting down OAuth server...')
+			response = make_response('Close this browser to terminate the process!')
+			response.call_on_close(done.set)
+			return response
 
 	except Exception as e:
 		logging.debug(e)
 
 	'''
 	======================================
-		Define a function to start the
-		Flask server using Waitress in
-		production mode
+		Define a function to create the
+		server: Waitress in production
+		mode, the Werkzeug development
+		server otherwise.
+
+		The server socket is bound and
+		listening once it is created.
+		Return the server with its run
+		and stop functions
 	======================================
 	'''
 
-	def start_server():
-		serve(app, host=host, port=port)
+	def create_server():
+		if prod_status == "true":
+			logging.info('Running program in production mode...')
+			server = create_waitress_server(app, host=host, port=port)
+
+			# Close the server and its connections from its own loop
+			def stop():
+				server.trigger.pull_trigger(lambda: close_all(server._map))
+				server.task_dispatcher.shutdown()
+
+			return server.run, stop
+
+		logging.info('Running program in development mode...')
+		server = make_server(host, int(port), app, threaded=True)
+		return server.serve_forever, server.shutdown
 
 	'''
 	======================================
-		Define a function to start the
-		production server inside a new
-		thread.
-
-		This is to ensure the server is
-		actually already running before
-		opening the web browser
+		Define a function to run the
+		server in a daemon thread, signaling
+		when it is ready to accept the
+		browser connections (or failed to
+		start)
 	======================================
 	'''
 
-	def run_prod():
-		logging.info('Running program in production mode...')
-		server_thread = threading.Thread(target=start_server)
-		server_thread.start()
-		time.sleep(2)
+	server = {}
+
+	def run_server():
+		try:
+			server['run'], server['stop'] = create_server()
+
+		except Exception as e:
+			logging.debug(e)
+			return
 
-		# Launch a separate browser process with a new profile
-		subprocess.run([browser_path, "-CreateProfile", "new_profile", "-no-remote"])
-		subprocess.run([browser_path, "-P", "new_profile", "-no-remote", home_url])
+		finally:
+			ready.set()
+
+		server['run']()
 
 	'''
 	======================================
-		Define a function to start the
-		development server inside a new
-		thread.
+		Define a function to open the
+		home URL in the browser
+
+		*	In production mode, launch a
+			separate browser process with the
+			Inopy profile, only created the
+			first time
 
-		This is to ensure the server is
-		actually already running before
-		opening the web browser
+		*	Otherwise open it in the default
+			web browser
 	======================================
 	'''
 
-	def run_dev():
-		logging.info('Running program in development mode...')
-		server_thread = threading.Thread(target=start_server)
-		server_thread.start()
-		time.sleep(2)
+	def open_browser():
+		if prod_status == "true":
+			if not profile_exists(PROFILE_NAME):
+				subprocess.run([browser_path, "-CreateProfile", PROFILE_NAME, "-no-remote"])
 
-		# Open the home URL in the default web browser
-		webbrowser.open(home_url)
-		app.run()
+			subprocess.Popen([browser_path, "-P", PROFILE_NAME, "-no-remote", home_url])
+
+		else:
+			webbrowser.open(home_url)
 
 	'''
 	======================================
-		Determine whether to run the
-		production or development server
-		based on the config
+		Start the server and open the
+		browser as soon as it is ready.
+
+		Wait until the tokens are saved
+		(or the shutdown url is accessed),
+		at most the OAuth timeout, then stop
+		the server and return whether new
+		tokens were saved
 	======================================
 	'''
-		
-	try:
-		if prod_status == "true":
-			run_prod()
 
-		else:
-			run_dev()
+	threading.Thread(target=run_server, daemon=True).start()
+	ready.wait()
+
+	if 'stop' not in server:
+		logging.warning('OAuth server could not be started...')
+		return False
+
+	try:
+		open_browser()
 
 	except Exception as e:
 		logging.debug(e)
 
+	if not done.wait(timeout):
+		logging.warning(f'No token received within {timeout} seconds: stopping OAuth server...')
+
+	server['stop']()
+	return saved.is_set()
+
+'''
+======================================
+	Define a function to check if a
+	Firefox profile already exists in
+	the profiles.ini file
+======================================
+'''
+
+def profile_exists(name):
+	parser = configparser.ConfigParser()
+	parser.read(os.path.join(os.environ['HOME'], '.mozilla/firefox/profiles.ini'))
+
+	return any(parser.get(section, 'Name', fallback=None) == name for section in parser.sections())
+
 '''
 ======================================
 	Run the application standalone
@@ -293,4 +379,4 @@ def run_app():
 '''
 
 if __name__ == '__main__':
-	run_app()
\ No newline at end of file
+	run_app()
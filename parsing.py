@@ -0,0 +1,105 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module parses the JSON responses of the Inoreader API from their raw bytes.
+
+	If the optional ijson package is installed, the feeds list is parsed as a stream while it is downloaded, one subscription at a time, and only the fields used by Inopy (id, title and category ids of each subscription) are kept, so that the memory used stays flat whatever the number of subscriptions. If the optional orjson package is installed, it is used to parse the other responses faster.
+
+=========================================================================================
+"""
+
+import io
+import json
+
+# Optional faster or streaming JSON backends
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+try:
+	import ijson
+except ImportError:
+	ijson = None
+
+# The feeds list response can be parsed while it is downloaded
+streaming = ijson is not None
+
+'''
+==============================================
+	Define a function to parse JSON bytes
+	without decoding them to a string first
+==============================================
+'''
+
+def loads(content):
+	if orjson is not None:
+		return orjson.loads(content)
+
+	return json.loads(content)
+
+'''
+==================================================
+	Define a function to iterate over the
+	subscriptions of a feeds list given as bytes
+	or as a binary file (e.g. the raw stream of
+	a response) and yield the (id, title, folder
+	ids) of each of them
+
+	*	With ijson, build one subscription at a
+		time from the stream and only keep its id,
+		title and category ids, so that the
+		other fields (URLs, icon...) are released
+		right away
+
+	*	Otherwise parse the whole document and
+		extract the same fields
+==================================================
+'''
+
+def iter_subscriptions(source):
+	if ijson is None:
+		if not isinstance(source, bytes):
+			source = source.read()
+
+		subscriptions = loads(source)['subscriptions']
+
+	else:
+		if isinstance(source, bytes):
+			source = io.BytesIO(source)
+
+		subscriptions = ijson.items(source, 'subscriptions.item')
+
+	for subscribed in subscriptions:
+		yield subscribed['id'], subscribed['title'], [category['id'] for category in subscribed['categories']]
+
+'''
+==================================================
+	Define a function to iterate over the
+	subscriptions of a feeds list response.
+
+	With ijson, the response is requested as a
+	stream and parsed from its raw stream
+	(decompressed if needed), otherwise from its
+	content
+==================================================
+'''
+
+def response_subscriptions(response):
+	if streaming:
+		response.raw.decode_content = True
+		return iter_subscriptions(response.raw)
+
+	return iter_subscriptions(response.content)
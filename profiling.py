@@ -0,0 +1,253 @@
+"""
+=========================================================================================
+
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module profiles a run of Inopy (ino.py --profile) and writes the reports to /HOME/USER/.inopy/profiles/:
+
+	*	cpu: the hot functions of all the threads measured with cProfile, sorted by cumulative and by own time (.txt), and the raw statistics (.prof) for snakeviz, gprof2dot or flameprof
+
+	*	memory: the peak memory and the top allocation sites measured with tracemalloc (.txt)
+
+	*	flamegraph: the stacks of all the threads sampled at a regular interval, in the collapsed format read by flamegraph.pl, inferno or speedscope (.collapsed)
+
+=========================================================================================
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Set the path of the profiles directory to /HOME/USER/.inopy/profiles
+profiles_dir = os.path.join(os.environ['HOME'], '.inopy/profiles')
+
+# Number of lines of the reports and of frames kept per allocation
+TOP = 40
+FRAMES = 25
+
+# Interval (in seconds) between two samples of the flamegraph stacks
+SAMPLE_INTERVAL = 0.005
+
+# From Python 3.12, cProfile is built on sys.monitoring, whose events are
+# global: a single profiler sees all the threads and no second one can be enabled
+SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+'''
+==================================================
+	Define a class profiling all the threads with
+	cProfile
+
+	The profiler of the current thread is enabled
+	directly. Before Python 3.12, every thread
+	started afterwards (e.g. the HTTP requests
+	workers) enables its own profiler on its first
+	profiling event and the statistics of all the
+	profilers are added up at the end. From
+	Python 3.12, the profiler of the current
+	thread already records all of them.
+
+	A thread whose profiler cannot be enabled is
+	not profiled, but keeps running
+==================================================
+'''
+
+class ThreadsProfiler:
+
+	def __init__(self):
+		self.profiles = []
+		self.lock = threading.Lock()
+
+	def new_profile(self):
+		profile = cProfile.Profile()
+
+		try:
+			profile.enable()
+
+		except ValueError as e:
+			logging.debug(f'Thread not profiled: {e}')
+			return
+
+		with self.lock:
+			self.profiles.append(profile)
+
+	def start_thread(self, frame, event, arg):
+		sys.setprofile(None)
+		self.new_profile()
+
+	def start(self):
+		if not SINGLE_PROFILER:
+			threading.setprofile(self.start_thread)
+
+		self.new_profile()
+
+	def stop(self):
+		threading.setprofile(None)
+
+		with self.lock:
+			profiles = list(self.profiles)
+
+		# No profiler could be enabled (e.g. another profiling tool is active)
+		if not profiles:
+			return None
+
+		profiles[0].disable()
+		stats = pstats.Stats(profiles[0])
+
+		for profile in profiles[1:]:
+			stats.add(profile)
+
+		return stats
+
+'''
+==================================================
+	Define a class sampling the stacks of all the
+	threads (except its own) in a daemon thread
+	and counting each stack, root first
+==================================================
+'''
+
+class StackSampler:
+
+	def __init__(self, interval=SAMPLE_INTERVAL):
+		self.interval = interval
+		self.stacks = {}
+		self.stopped = threading.Event()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+
+	def run(self):
+		own_id = threading.get_ident()
+
+		while not self.stopped.wait(self.interval):
+			for thread_id, frame in sys._current_frames().items():
+				if thread_id == own_id:
+					continue
+
+				stack = []
+
+				while frame is not None:
+					code = frame.f_code
+					stack.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+					frame = frame.f_back
+
+				key = ';'.join(reversed(stack))
+				self.stacks[key] = self.stacks.get(key, 0) + 1
+
+	def start(self):
+		self.thread.start()
+
+	def stop(self):
+		self.stopped.set()
+		self.thread.join()
+		return self.stacks
+
+'''
+==================================================
+	Define functions to write the reports
+==================================================
+'''
+
+def write_cpu_report(stats, path):
+	with open(path + '-cpu.txt', 'w') as report:
+		stats.stream = report
+		report.write('Hot functions by cumulative time\n\n')
+		stats.sort_stats('cumulative').print_stats(TOP)
+		report.write('Hot functions by own time\n\n')
+		stats.sort_stats('tottime').print_stats(TOP)
+
+	stats.dump_stats(path + '.prof')
+
+def write_memory_report(snapshot, peak, path):
+	snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+	with open(path + '-memory.txt', 'w') as report:
+		report.write('Peak traced memory: {:.1f} KiB\n\n'.format(peak / 1024))
+		report.write('Top allocation sites\n\n')
+
+		for stat in snapshot.statistics('lineno')[:TOP]:
+			report.write('{}\n'.format(stat))
+
+		report.write('\nTop allocation tracebacks\n')
+
+		for stat in snapshot.statistics('traceback')[:5]:
+			report.write('\n{} blocks, {:.1f} KiB\n'.format(stat.count, stat.size / 1024))
+			report.write('\n'.join(stat.traceback.format()) + '\n')
+
+def write_flamegraph(stacks, path):
+	with open(path + '.collapsed', 'w') as report:
+		for stack, count in sorted(stacks.items()):
+			report.write('{} {}\n'.format(stack, count))
+
+'''
+==================================================
+	Define a context manager profiling the code
+	it runs
+
+	*	modes is "cpu", "memory" or "all"
+
+	*	If flamegraph is set, also sample the
+		stacks of all the threads
+
+	The reports are written when the code ends,
+	even if it fails, to files named after the
+	start time of the run
+==================================================
+'''
+
+@contextmanager
+def profile(modes='all', flamegraph=False):
+	os.makedirs(profiles_dir, exist_ok=True)
+	path = os.path.join(profiles_dir, time.strftime('%Y%m%d-%H%M%S'))
+
+	cpu = modes in ('cpu', 'all')
+	memory = modes in ('memory', 'all')
+
+	sampler = StackSampler() if flamegraph else None
+	profiler = ThreadsProfiler() if cpu else None
+
+	if memory:
+		tracemalloc.start(FRAMES)
+
+	if sampler is not None:
+		sampler.start()
+
+	if profiler is not None:
+		profiler.start()
+
+	try:
+		yield
+
+	finally:
+		# Take the memory snapshot before the other reports allocate memory
+		if memory:
+			snapshot = tracemalloc.take_snapshot()
+			peak = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+
+		stats = profiler.stop() if profiler is not None else None
+
+		if stats is not None:
+			write_cpu_report(stats, path)
+
+		if sampler is not None:
+			write_flamegraph(sampler.stop(), path)
+
+		if memory:
+			write_memory_report(snapshot, peak, path)
+
+		logging.info(f'Profile reports written to {path}*')
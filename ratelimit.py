@@ -0,0 +1,151 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module keeps track of the Inoreader API rate limits <https://www.inoreader.com/developers/rate-limiting>.
+
+	Inoreader reports the usage and limit of each zone (zone 1 for read requests, zone 2 for write requests) and the time until the limits are reset in the response headers. The quota parsed from these headers is kept across runs, so that the polling interval can be spread over the remaining budget and the polls skipped while the limit is reached (e.g. after a 429 response) instead of failing.
+
+=========================================================================================
+"""
+
+import time
+from email.utils import parsedate_to_datetime
+
+# Delay (in seconds) to wait after a 429 response without Retry-After header
+DEFAULT_BACKOFF = 3600
+
+'''
+===================================================
+	Define a function to get the delay (in
+	seconds) of a Retry-After header, given
+	either in seconds or as an HTTP date. Return
+	None if it cannot be parsed
+===================================================
+'''
+
+def retry_after(value):
+	try:
+		return float(value)
+
+	except ValueError:
+		pass
+
+	try:
+		return parsedate_to_datetime(value).timestamp() - time.time()
+
+	except (TypeError, ValueError):
+		return None
+
+'''
+===================================================
+	Define a function to record the rate limit
+	headers of a response in the quota dictionary
+
+	*	Store the usage and limit of each zone
+		and the time of the next reset
+
+	*	If the response status code is 429 (Too
+		Many Requests), block the requests until
+		the Retry-After delay or date, or else
+		the reset time
+===================================================
+'''
+
+def record(quota, response):
+	headers = response.headers
+
+	for zone in ('1', '2'):
+		usage = headers.get('X-Reader-Zone{}-Usage'.format(zone))
+		limit = headers.get('X-Reader-Zone{}-Limit'.format(zone))
+
+		if usage is not None and limit is not None:
+			quota['zone' + zone] = [int(usage), int(limit)]
+
+	reset_after = headers.get('X-Reader-Limits-Reset-After')
+
+	if reset_after is not None:
+		quota['reset_at'] = time.time() + float(reset_after)
+
+	if response.status_code == 429:
+		delay = retry_after(headers.get('Retry-After') or '')
+
+		if delay is None:
+			delay = float(reset_after or DEFAULT_BACKOFF)
+
+		quota['blocked_until'] = time.time() + delay
+
+'''
+===================================================
+	Define a function to check if the requests
+	are blocked: after a 429 response, or if the
+	read zone usage reached its limit before the
+	next reset
+===================================================
+'''
+
+def is_blocked(quota):
+	now = time.time()
+
+	if quota.get('blocked_until', 0) > now:
+		return True
+
+	usage, limit = quota.get('zone1', (0, 0))
+	return bool(limit) and usage >= limit and quota.get('reset_at', 0) > now
+
+'''
+===================================================
+	Define a function to compute the delay (in
+	seconds) before the next poll
+
+	*	While blocked, wait until the end of the
+		block after a 429 response, or until the
+		reset time if the limit is reached
+
+	*	Otherwise spread the remaining read
+		requests evenly until the next reset,
+		given the number of requests of a poll
+
+	*	Beyond the threshold ratio of the limit,
+		lower the polling frequency further (up to
+		twice less often when the limit is reached)
+
+	The delay is never shorter than the base
+	interval
+===================================================
+'''
+
+def next_interval(quota, interval, requests_per_poll, threshold=0.8):
+	now = time.time()
+
+	if quota.get('blocked_until', 0) > now:
+		return max(interval, quota['blocked_until'] - now)
+
+	if is_blocked(quota):
+		return max(interval, quota['reset_at'] - now)
+
+	usage, limit = quota.get('zone1', (0, 0))
+	reset_at = quota.get('reset_at', 0)
+
+	if not limit or reset_at <= now:
+		return interval
+
+	remaining = max(limit - usage, 1)
+	delay = (reset_at - now) * max(requests_per_poll, 1) / remaining
+	ratio = usage / limit
+
+	if ratio > threshold:
+		delay *= 1 + (ratio - threshold) / (1 - threshold)
+
+	return max(interval, delay)
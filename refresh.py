@@ -34,37 +34,42 @@
 
 	*	Send a POST request to the specified
 		endpoint with the payload and headers
+		using the shared HTTP session
 	
 	*	Check the response status code to determine
-		if the request was successful
+		if the request was successful (otherwise
+		keep the current tokens)
 	
 	*	Parse the response data as JSON and extract
-		the refreshed bearer token and new refresh
-		token from the response data
-	
-	*	Open the config file. Load the existing
-		config data from the file and update the
-		bearer token and refresh token in the config
+		the refreshed bearer token, new refresh
+		token and expiration delay from the response
 		data
 	
-	*	Move the file pointer to the beginning of
-		the file, write the updated config data back
-		to the file, overwriting the existing content
-	
-	*	Truncate the file to remove any remaining
-		content after the updated data
+	*	Update the bearer token, refresh token and
+		expiration time in the config file through
+		the config store, which writes the file
+		atomically under a lock
 =====================================================
 '''
 
-import requests
 import json
+import time
+import fcntl
 import logging
+import metrics
+import transport
+from contextlib import contextmanager
+from config import get_store
 from logs import LogFile
 
 # Set logs file
 log_file = LogFile()
 
 def refresh(config_path, endpoint, client_id, client_secret, refresh_token):
+	with metrics.span('refresh'):
+		refresh_tokens(config_path, endpoint, client_id, client_secret, refresh_token)
+
+def refresh_tokens(config_path, endpoint, client_id, client_secret, refresh_token):
 	headers = {"Content-type": "application/x-www-form-urlencoded"}
 	
 	payload = {
@@ -74,25 +79,88 @@ def refresh(config_path, endpoint, client_id, client_secret, refresh_token):
 		"refresh_token": refresh_token
 	}
 	
-	response = requests.post(endpoint, data=payload, headers=headers)
+	response = transport.get_session().post(endpoint, data=payload, headers=headers)
+	metrics.record_response(response)
 	
 	if response.status_code == 200:
 		logging.info("Request was successful. Token was refreshed...")
 	
 	else:
 		logging.debug(f'Request failed with status code: {response.status_code}')
+		return
 	
 	data = json.loads(response.text)
 
 	refreshed_bearer = data['access_token']
 	new_refresh_token = data['refresh_token']
+	expires_in = data.get('expires_in')
+	expires_at = int(time.time()) + int(expires_in) if expires_in else 0
+
+	get_store(config_path).update({
+		'oauth': {
+			'bearer': refreshed_bearer,
+			'refresh_token': new_refresh_token,
+			'expires_at': expires_at
+		}
+	})
+
+'''
+=====================================================
+	Create a context manager holding an exclusive
+	lock on the refresh lock file (next to the
+	config file) so that only one process at a time can
+	refresh the tokens. The other processes wait
+	until the lock is released
+=====================================================
+'''
+
+@contextmanager
+def token_lock(config_path):
+	with open(config_path + '.refresh.lock', 'w') as lock_file:
+		fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+		try:
+			yield
+
+		finally:
+			fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+'''
+=====================================================
+	Create a single-flight refresh function to
+	refresh the tokens only once across processes
+
+	*	Acquire the token lock
+
+	*	Reload the current tokens from the config file
+
+	*	If the bearer token in the config file is not
+		the one the caller knows, another process
+		already refreshed it: use it as is
+
+	*	If the refresh is not forced (e.g. after a 401
+		response) and the bearer token does not expire
+		within the margin (in seconds), use it as is
+
+	*	Otherwise refresh the tokens with the current
+		refresh token of the config file (the one the
+		caller knows may have been rotated)
+=====================================================
+'''
+
+def ensure_token(config_path, endpoint, client_id, client_secret, bearer, margin=300, force=False):
+	with token_lock(config_path):
+		store = get_store(config_path)
+		store.load()
+		oauth = store.config['oauth']
+
+		if oauth['bearer'] != bearer:
+			logging.info('Token already refreshed by another process...')
+			return
 
-	with open(config_path, 'r+') as config_file:
-		config = json.load(config_file)
+		expires_at = oauth.get('expires_at', 0)
 
-		config['oauth']['bearer'] = refreshed_bearer
-		config['oauth']['refresh_token'] = new_refresh_token
+		if not force and (not expires_at or expires_at - time.time() > margin):
+			return
 
-		config_file.seek(0)
-		json.dump(config, config_file, indent=4)
-		config_file.truncate()
\ No newline at end of file
+		refresh(config_path, endpoint, client_id, client_secret, oauth['refresh_token'])
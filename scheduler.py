@@ -0,0 +1,77 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides the polling scheduler used when Inopy runs as a long-running daemon.
+
+	It calls a job at a fixed rate based on a monotonic clock, so that the time spent by a polling cycle does not shift the next ones, and stops cleanly on SIGINT or SIGTERM. The interval can also be computed after each cycle (e.g. to fit the API rate limits).
+
+=========================================================================================
+"""
+
+import time
+import signal
+import logging
+import threading
+
+'''
+==================================================
+	Define a function to run a job at a regular
+	interval until the process is stopped. The
+	interval is either a number of seconds or a
+	function returning it after each cycle
+
+	*	Install SIGINT and SIGTERM handlers
+		setting the stop event
+
+	*	Run the job. A failing cycle is logged
+		and does not stop the scheduler
+
+	*	Compute the next run time. If a cycle
+		took longer than the interval, start the
+		next one right away instead of trying to
+		catch up with the missed ones
+
+	*	Wait until the next run time or until
+		the stop event is set
+==================================================
+'''
+
+def run(job, interval):
+	stop = threading.Event()
+
+	def handle_signal(signum, frame):
+		logging.info(f'Received signal {signum}: stopping scheduler...')
+		stop.set()
+
+	signal.signal(signal.SIGINT, handle_signal)
+	signal.signal(signal.SIGTERM, handle_signal)
+
+	next_run = time.monotonic()
+
+	while not stop.is_set():
+		try:
+			job()
+
+		except Exception as e:
+			logging.debug(e)
+
+		next_run += interval() if callable(interval) else interval
+		delay = next_run - time.monotonic()
+
+		if delay < 0:
+			next_run = time.monotonic()
+			delay = 0
+
+		stop.wait(delay)
@@ -0,0 +1,203 @@
+"""
+=========================================================================================
+
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module shares the latest unread state of Inopy with local readers (e.g. status bar widgets), so that they do not make their own API requests.
+
+	After every poll the total unread count and the per-feed and per-folder counts are published as JSON: served over a local Unix socket in daemon mode and saved in the cache directory otherwise. The client command prints them.
+
+	Usage: python status.py [--total] [--socket PATH]
+
+=========================================================================================
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import cache
+
+# Cache entry holding the last published status (read when no daemon is running)
+CACHE_NAME = 'status'
+
+# Server of the Unix socket (None if not running) and the JSON body it sends
+server = None
+payload = b'{}'
+
+'''
+==================================================
+	Define a function to get the status of the
+	polled accounts from their unread snapshots
+
+	*	The unread ids which are folders of the
+		registry are listed as folders, the other
+		ones (except the reading-list) as feeds,
+		with their titles and counts, the highest
+		counts first
+
+	*	The total is the sum of the feed counts.
+		When several accounts are polled, each feed
+		and folder is given its account name
+==================================================
+'''
+
+def get_status(states):
+	feeds = []
+	folders = []
+
+	for state in states:
+		registry = state['registry']
+		account = {'account': state['name']} if state['name'] is not None else {}
+
+		# The snapshot of the last check is pending until its notification is sent
+		snapshot = state['pending_snapshot'] if state['pending_snapshot'] is not None else state['unread_snapshot']
+
+		for unread_id, (count, newest) in snapshot.items():
+			if registry.is_folder(unread_id):
+				folders.append(dict(account, id=unread_id, title=registry.title(unread_id), count=count))
+
+			elif unread_id.split('/')[-1] != 'reading-list':
+				feeds.append(dict(account, id=unread_id, title=registry.title(unread_id), count=count))
+
+	feeds.sort(key=lambda feed: feed['count'], reverse=True)
+	folders.sort(key=lambda folder: folder['count'], reverse=True)
+
+	return {
+		'updated_at': int(time.time()),
+		'unread': sum(feed['count'] for feed in feeds),
+		'feeds': feeds,
+		'folders': folders
+	}
+
+'''
+==================================================
+	Define a function to publish the status after
+	a poll
+
+	*	Serialize it once: the server sends the
+		same bytes to every reader
+
+	*	Save it in the cache, for the readers
+		when no daemon is running
+==================================================
+'''
+
+def publish(states):
+	global payload
+
+	status = get_status(states)
+	payload = json.dumps(status, separators=(',', ':')).encode()
+	cache.write_entry(CACHE_NAME, status)
+
+'''
+==================================================
+	Define functions to start and stop the Unix
+	socket server (in daemon mode)
+
+	*	Remove a socket file left by a previous
+		run, bind the socket readable by the user
+		only and serve the readers in a daemon
+		thread
+
+	*	Every connection gets the last published
+		status and is closed
+==================================================
+'''
+
+def serve(path):
+	global server
+
+	import socketserver
+
+	class Handler(socketserver.BaseRequestHandler):
+		def handle(self):
+			self.request.sendall(payload)
+
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+
+	if os.path.exists(path):
+		os.remove(path)
+
+	umask = os.umask(0o177)
+
+	try:
+		server = socketserver.ThreadingUnixStreamServer(path, Handler)
+
+	finally:
+		os.umask(umask)
+
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	logging.info(f'Serving the unread status on {path}')
+
+def stop():
+	global server
+
+	if server is not None:
+		server.shutdown()
+		server.server_close()
+		os.remove(server.server_address)
+		server = None
+
+'''
+==================================================
+	Define a function to query the status
+
+	*	Read it from the Unix socket of the daemon
+
+	*	If no daemon is running, read the last
+		status saved in the cache
+==================================================
+'''
+
+def query(path, timeout=1):
+	try:
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+			client.settimeout(timeout)
+			client.connect(path)
+			chunks = []
+
+			while True:
+				chunk = client.recv(65536)
+
+				if not chunk:
+					break
+
+				chunks.append(chunk)
+
+		# Before its first poll, the daemon has no status yet
+		return json.loads(b''.join(chunks)) or cache.load_entry(CACHE_NAME)
+
+	except (FileNotFoundError, ConnectionRefusedError):
+		return cache.load_entry(CACHE_NAME)
+
+def main():
+	parser = argparse.ArgumentParser(description='Print the unread status of Inopy as JSON.')
+	parser.add_argument('--total', action='store_true', help='only print the total unread count')
+	parser.add_argument('--socket', default=os.path.join(os.environ['HOME'], '.inopy/inopy.sock'), help='path of the Unix socket (default: ~/.inopy/inopy.sock)')
+	args = parser.parse_args()
+
+	status = query(args.socket)
+
+	if status is None:
+		print('No unread status available yet.')
+		raise SystemExit(1)
+
+	print(status['unread'] if args.total else json.dumps(status))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,268 @@
+"""
+=========================================================================================
+	
+	Copyright © 2023 Alexandre Racine <https://alex-racine.ch>
+
+	This file is part of Inopy.
+
+	Inopy is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+	Inopy is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License along with Inopy. If not, see <https://www.gnu.org/licenses/>.
+
+=========================================================================================
+
+	This module provides the HTTP transport layer shared by the Inopy modules making requests to Inoreader (ino, refresh and oauth).
+
+	It keeps a single requests session with a keep-alive connection pool, so that successive requests (e.g. a 401 response, the token refresh and the retried request) reuse the same TCP and TLS connection instead of opening a new one each time.
+
+	Every request is bounded: its connect and read timeouts never go beyond the deadline of the current run, the idempotent GET requests are retried with a jittered exponential backoff on network errors and 5xx responses, and a circuit breaker persisted in the cache makes the following runs fail fast while the API is unreachable.
+
+=========================================================================================
+"""
+
+import time
+import random
+import logging
+import threading
+import requests
+import cache
+import metrics
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+# Default number of connections kept alive per host
+DEFAULT_POOL_SIZE = 4
+
+# Session shared between the modules
+session = None
+
+# Timeouts (in seconds), retries and circuit breaker settings (see configure)
+settings = {
+	'connect_timeout': 5,
+	'read_timeout': 20,
+	'retries': 2,
+	'backoff': 0.5,
+	'breaker_threshold': 3,
+	'breaker_cooldown': 300
+}
+
+# Status codes of the GET responses worth retrying
+RETRY_STATUS = (500, 502, 503, 504)
+
+# Monotonic time at which the current run must end (None if unbounded)
+deadline = None
+
+# Circuit breaker state per host (loaded from the cache on first use)
+circuit = None
+circuit_lock = threading.Lock()
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+	pass
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+	pass
+
+'''
+================================================
+	Define functions to set the transport
+	settings from the config and to start the
+	deadline of a run (no deadline if seconds is
+	0 or None)
+================================================
+'''
+
+def configure(**kwargs):
+	settings.update(kwargs)
+
+def start_deadline(seconds):
+	global deadline
+	deadline = time.monotonic() + seconds if seconds else None
+
+'''
+================================================
+	Define a function to get the (connect, read)
+	timeouts of a request: the configured ones,
+	shortened to the time left before the
+	deadline. Raise DeadlineExceeded if the
+	deadline is over
+================================================
+'''
+
+def get_timeout():
+	connect_timeout, read_timeout = settings['connect_timeout'], settings['read_timeout']
+
+	if deadline is None:
+		return connect_timeout, read_timeout
+
+	remaining = deadline - time.monotonic()
+
+	if remaining <= 0:
+		raise DeadlineExceeded('Run deadline exceeded')
+
+	return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+'''
+================================================
+	Define the functions of the circuit breaker
+
+	*	check raises CircuitOpen while the
+		circuit of a host is open
+
+	*	record_failure counts a failed request
+		(network error or 5xx response after the
+		retries). From breaker_threshold failures
+		in a row, the circuit is opened for
+		breaker_cooldown seconds. Once they are
+		over, the next request is a trial: if it
+		fails too, the circuit is opened again
+
+	*	record_success closes the circuit
+
+	The state is saved in the cache whenever it
+	changes, so that it is shared by the
+	following runs
+================================================
+'''
+
+def load_circuit():
+	global circuit
+
+	if circuit is None:
+		circuit = cache.load_entry('circuit') or {}
+
+	return circuit
+
+def check(host):
+	state = load_circuit().get(host)
+
+	if state is not None and state['open_until'] > time.time():
+		raise CircuitOpen(f'Circuit open for {host}: failing fast until {time.ctime(state["open_until"])}')
+
+def record_failure(host):
+	with circuit_lock:
+		state = load_circuit().setdefault(host, {'failures': 0, 'open_until': 0})
+		state['failures'] += 1
+
+		if state['failures'] >= settings['breaker_threshold']:
+			state['open_until'] = time.time() + settings['breaker_cooldown']
+			logging.info(f'{host} unreachable: opening the circuit for {settings["breaker_cooldown"]} seconds...')
+
+		cache.write_entry('circuit', circuit)
+
+def record_success(host):
+	with circuit_lock:
+		state = load_circuit().get(host)
+
+		if state is not None and (state['failures'] or state['open_until']):
+			del circuit[host]
+			cache.write_entry('circuit', circuit)
+
+'''
+================================================
+	Define the session class bounding every
+	request
+
+	*	Fail fast if the circuit of the host is
+		open
+
+	*	Set the timeouts of each attempt from the
+		deadline (unless the caller sets them)
+
+	*	Retry the GET requests (idempotent) on
+		network errors and 5xx responses, after
+		an exponential backoff with a random
+		jitter, unless the deadline would be over
+		before the next attempt
+
+	*	Record the result in the circuit breaker
+================================================
+'''
+
+class BoundedSession(requests.Session):
+
+	def request(self, method, url, *args, **kwargs):
+		host = urlsplit(url).netloc
+		check(host)
+
+		attempts = 1 + (settings['retries'] if method.upper() == 'GET' else 0)
+		timeout = kwargs.pop('timeout', None)
+
+		for attempt in range(attempts):
+			kwargs['timeout'] = timeout or get_timeout()
+			error = response = None
+
+			try:
+				response = super().request(method, url, *args, **kwargs)
+
+			except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+				error = e
+
+			if response is not None and response.status_code not in RETRY_STATUS:
+				record_success(host)
+				return response
+
+			delay = settings['backoff'] * 2 ** attempt * random.uniform(0.5, 1.5)
+
+			if attempt + 1 == attempts or (deadline is not None and time.monotonic() + delay >= deadline):
+				break
+
+			logging.info(f'Request to {host} failed ({error or response.status_code}): retrying in {delay:.2f} seconds...')
+			metrics.count('retries', 1)
+
+			if response is not None:
+				response.close()
+
+			time.sleep(delay)
+
+		record_failure(host)
+
+		if response is None:
+			raise error
+
+		return response
+
+'''
+================================================
+	Define a function to get the shared session
+
+	*	Create the (bounded) session the first
+		time with an HTTP adapter keeping up to
+		pool_size connections alive per host for
+		both HTTP and HTTPS
+
+	*	Return the same session afterwards.
+		The pool size is only taken into
+		account when the session is created
+================================================
+'''
+
+def get_session(pool_size=None):
+	global session
+
+	if session is None:
+		pool_size = pool_size or DEFAULT_POOL_SIZE
+		adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+		session = BoundedSession()
+		session.mount('https://', adapter)
+		session.mount('http://', adapter)
+
+		logging.info(f'HTTP session created with a pool of {pool_size} connections...')
+
+	return session
+
+'''
+================================================
+	Define a function to close the shared
+	session and its pooled connections
+================================================
+'''
+
+def close_session():
+	global session
+
+	if session is not None:
+		session.close()
+		session = None